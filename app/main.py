@@ -1,12 +1,54 @@
 # FastAPI server entry
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException, Header, Request, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from routes import slack_routes, github_routes
+from services.job_handlers import JOB_HANDLERS
+from services.cache_service import get_cache_stats
+from services.job_queue import JobWorker, count_live_consumers, get_queue_stats
+from services.lifecycle import shutdown, startup
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from utils.config import EMBEDDED_WORKER_CONCURRENCY, GITHUB_WEBHOOK_SECRET, JOB_QUEUE_ENABLED
+from utils.logging_config import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+# Start shared background workers on startup and drain them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    if not GITHUB_WEBHOOK_SECRET:
+        logger.warning("GITHUB_WEBHOOK_SECRET is not set; webhook signatures will not be verified")
+
+    # Consume the job queue in-process unless it is left to separate worker.py processes
+    worker, worker_task = None, None
+    if EMBEDDED_WORKER_CONCURRENCY > 0:
+        worker = JobWorker(handlers=JOB_HANDLERS, concurrency=EMBEDDED_WORKER_CONCURRENCY)
+        worker_task = asyncio.create_task(worker.run())
+    elif JOB_QUEUE_ENABLED and not await count_live_consumers():
+        logger.warning(
+            "EMBEDDED_WORKER_CONCURRENCY is 0 and no worker has polled the job queue recently; "
+            "summaries and webhooks will wait until a worker.py process starts"
+        )
+
+    yield
+
+    if worker:
+        worker.stop()
+        await worker_task
+    await shutdown()
+
 
 # Initialize FastAPI
-app = FastAPI(title="Slack GPT Bot Server")
+app = FastAPI(title="Slack GPT Bot Server", lifespan=lifespan)
 
 origins = ["http://localhost:3000"]
 app.add_middleware(
@@ -28,6 +70,24 @@ async def ping():
     return {"pong": "pong"}
 
 
+# Prometheus scrape endpoint: stage latencies, cache/LLM counters, job and event loop gauges
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+# Job queue depth, for dashboards and autoscaling workers
+@app.get("/jobs/stats")
+async def job_stats():
+    return await get_queue_stats()
+
+
+# Summary cache hit rates per tier (this process only)
+@app.get("/cache/stats")
+async def cache_stats():
+    return get_cache_stats()
+
+
 # Slack verification - Handle Slack URL verification and events
 @app.post("/")
 async def slack_challenge(request: Request):
@@ -1,24 +1,81 @@
+from typing import List, Optional
+
 from fastapi import APIRouter, Request, Form, BackgroundTasks
 from fastapi.responses import PlainTextResponse
 
+from services.job_queue import enqueue_job
 from services.pr_service import PRService
+from utils.config import JOB_QUEUE_ENABLED
+from utils.server_utils import extract_compare_url, extract_pr_urls
 
 router = APIRouter()
 pr_service = PRService()
 
 
-# For PR link summarization. Validate, queue tasks, and send immediate response.
+# For PR link summarization. Validate, queue jobs, and send immediate response.
 @router.post("/summarizepr")
 async def handle_summarizepr(
     request: Request,
     text: str = Form(...),
     response_url: str = Form(...),  # Provided by Slack.
+    channel_id: Optional[str] = Form(None),  # Lets the reply be edited in place while it streams
     background_tasks: BackgroundTasks = BackgroundTasks(),
 ):
-    if "github.com" not in text or "/pull/" not in text:
-        return PlainTextResponse("Please provide a valid GitHub PR link.", status_code=200)
+    # Several links, a compare range or --release make a batch; one link keeps the single-PR path
+    pr_urls = extract_pr_urls(text)
+    compare_url = extract_compare_url(text)
+    release_summary = "--release" in text or compare_url is not None
+    if len(pr_urls) > 1 or compare_url or (pr_urls and release_summary):
+        return await queue_pr_batch(
+            pr_urls, compare_url, release_summary, response_url, channel_id, background_tasks
+        )
+
+    if not pr_urls:
+        return PlainTextResponse(
+            "Please provide a valid GitHub PR link, several links, or a compare link.", status_code=200
+        )
+
+    # Hand off to the durable job queue; fall back to an in-process task if it is unavailable
+    job_id = None
+    if JOB_QUEUE_ENABLED:
+        job_id = await enqueue_job(
+            "summarize_pr", {"pr_url": pr_urls[0], "response_url": response_url, "channel_id": channel_id}
+        )
+    if not job_id:
+        background_tasks.add_task(
+            pr_service.process_pr_summary, pr_urls[0], response_url, channel_id=channel_id
+        )
 
-    background_tasks.add_task(pr_service.process_pr_summary, text, response_url)
     immediate_response = "🔄 Analyzing PR... This may take a moment. I'll update you shortly!"
 
     return PlainTextResponse(immediate_response, status_code=200)
+
+
+async def queue_pr_batch(
+    pr_urls: List[str],
+    compare_url: Optional[str],
+    release_summary: bool,
+    response_url: str,
+    channel_id: Optional[str],
+    background_tasks: BackgroundTasks,
+) -> PlainTextResponse:
+    payload = {
+        "pr_urls": pr_urls,
+        "compare_url": compare_url,
+        "release_summary": release_summary,
+        "response_url": response_url,
+        "channel_id": channel_id,
+    }
+    job_id = await enqueue_job("summarize_pr_batch", payload) if JOB_QUEUE_ENABLED else None
+    if not job_id:
+        background_tasks.add_task(
+            pr_service.process_pr_batch,
+            pr_urls,
+            response_url,
+            channel_id=channel_id,
+            compare_url=compare_url,
+            release_summary=release_summary,
+        )
+
+    target = f"PRs in {compare_url}" if compare_url else f"{len(pr_urls)} PRs"
+    return PlainTextResponse(f"🔄 Summarizing {target}... Results will arrive as each one finishes.")
@@ -1,113 +1,618 @@
-from utils.redis_client import redis_client
+import asyncio
+from utils.config import (
+    FILE_SUMMARY_TTL,
+    GITHUB_CACHE_TTL,
+    LOCAL_CACHE_MAX_BYTES,
+    LOCAL_CACHE_MAX_ENTRIES,
+    LOCAL_CACHE_TTL,
+    PREWARM_TTL,
+    SHA_CACHE_TTL,
+    SUMMARY_STALE_TTL,
+    WEBHOOK_DELIVERY_TTL,
+)
+from utils.cache_codec import decode_hash, decode_value, encode_hash, encode_value
+from utils.local_cache import LocalCache
+from utils.redis_client import redis_binary_client, redis_client
+from utils.telemetry import CACHE_LOOKUPS
 import logging
-from typing import Dict, Optional, Any
+import time
+from typing import Dict, List, Optional, Set, Tuple, Any
 
 logger = logging.getLogger(__name__)
-TTL = 3600  # 1 hour
+TTL = 3600  # 1 hour, for entries without a head SHA to validate against
+BRANCH_INDEX_PREFIX = "pr_branch:"
+FILE_SUMMARY_PREFIX = "file_summary:"
+GITHUB_CACHE_PREFIX = "gh:"
+PREWARM_PREFIX = "prewarm:"
+HEAD_PREFIX = "pr_head:"  # Latest head SHA a webhook reported for each PR
+DELIVERY_PREFIX = "gh_delivery:"
+DELIVERY_CLAIM_TTL = 60  # Seconds a delivery ID is held before its job is queued
+BATCH_SENT_PREFIX = "batch_sent:"
+BATCH_SENT_TTL = 3600  # Outlives a slash command's response_url (30 minutes)
+CACHE_INVALIDATION_CHANNEL = "pr_cache:invalidate"  # Carries the pr_url of every changed entry
+
+# First tier for get_pr_cache; only consulted while the invalidation listener is subscribed
+_local_pr_cache: LocalCache[Dict[str, Any]] = LocalCache(
+    LOCAL_CACHE_MAX_ENTRIES, LOCAL_CACHE_MAX_BYTES, LOCAL_CACHE_TTL
+)
+_local_cache_live = False
+_redis_stats = {"hits": 0, "misses": 0}
+
+# Left unencoded so the Lua scripts can read them; every other field goes through cache_codec
+PLAIN_PR_FIELDS = ("state", "head_sha", "cached_at", "fresh_until")
+GITHUB_ENCODED_FIELDS = ("pr_json", "diff")  # Validators (ETag/Last-Modified) stay plain
+
+
+def _branch_index_key(repo_full_name: str, branch: str) -> str:
+    return f"{BRANCH_INDEX_PREFIX}{repo_full_name}:{branch}"
+
+
+def is_stale(pr_cache: Dict[str, Any]) -> bool:
+    """Past its freshness window; still served as last-known-good, but should be refreshed"""
+    fresh_until = pr_cache.get("fresh_until")
+    return fresh_until is not None and float(fresh_until) < time.time()
+
+
+# Write a summary unless a webhook has since reported a different head SHA for the PR (a push
+# landed mid-computation). KEYS: entry, latest head, branch index (or ""). ARGV: head_sha, ttl,
+# invalidation channel, then field/value pairs. Returns 1 if written, 0 if refused.
+_set_pr_cache_script = redis_binary_client.register_script(
+    """
+    local latest = redis.call("GET", KEYS[2])
+    if latest and ARGV[1] ~= "" and latest ~= ARGV[1] then
+        return 0
+    end
+    redis.call("HSET", KEYS[1], unpack(ARGV, 4))
+    redis.call("EXPIRE", KEYS[1], ARGV[2])
+    redis.call("PUBLISH", ARGV[3], KEYS[1])
+    if KEYS[3] ~= "" then
+        redis.call("SADD", KEYS[3], KEYS[1])
+        redis.call("EXPIRE", KEYS[3], ARGV[2])
+    end
+    return 1
+    """
+)
 
 
 async def set_pr_cache(pr_url: str, pr_dict: Dict[str, Any]) -> bool:
     try:
-        pipe = redis_client.pipeline()
-        pipe.hset(name=pr_url, mapping=pr_dict)
-        pipe.expire(name=pr_url, time=TTL)
-        await pipe.execute()
+        # Entries tagged with a head SHA are invalidated by webhooks when the PR changes,
+        # so they can stay fresh much longer than untagged ones.
+        fresh_for = SHA_CACHE_TTL if pr_dict.get("head_sha") else TTL
+        # Kept for SUMMARY_STALE_TTL past that as last-known-good for when GitHub/OpenAI are down
+        ttl = fresh_for + SUMMARY_STALE_TTL
+        now = time.time()
+        pr_dict = {**pr_dict, "cached_at": f"{now:.0f}", "fresh_until": f"{now + fresh_for:.0f}"}
+
+        # Index the PR by its head branch so pushes to that branch can find it
+        index_key = ""
+        if pr_dict.get("repo_full_name") and pr_dict.get("head_ref"):
+            index_key = _branch_index_key(pr_dict["repo_full_name"], pr_dict["head_ref"])
 
-        print(f"Successfully cached PR data for: {pr_url}")
-        # logger.info(f"Successfully cached PR data for: {pr_url}")
+        fields = [item for pair in encode_hash(pr_dict, PLAIN_PR_FIELDS).items() for item in pair]
+        written = await _set_pr_cache_script(
+            keys=[pr_url, f"{HEAD_PREFIX}{pr_url}", index_key],
+            args=[pr_dict.get("head_sha") or "", ttl, CACHE_INVALIDATION_CHANNEL, *fields],
+        )
+        _local_pr_cache.delete(pr_url)
+
+        if not written:
+            logger.info(f"Not caching summary of {pr_url} at {pr_dict['head_sha'][:7]}: the PR has a newer head")
+            return False
+        logger.info(f"Successfully cached PR data for: {pr_url}")
         return True
     except Exception as e:
         logger.error(f"Failed to cache PR data for {pr_url}: {e}")
         return False
 
 
+# State transition rules, applied atomically in one round trip: ignore entries that are not
+# cached and never go from merged to closed. Returns {code, current state}: -1 missing,
+# 0 ignored, 1 updated (and published on the invalidation channel).
+_state_transition_script = redis_client.register_script(
+    """
+    local current = redis.call("HGET", KEYS[1], "state")
+    if not current then
+        return {-1, ""}
+    end
+    if current == "merged" and ARGV[1] == "closed" then
+        return {0, current}
+    end
+    redis.call("HSET", KEYS[1], "state", ARGV[1])
+    redis.call("PUBLISH", ARGV[2], KEYS[1])
+    return {1, current}
+    """
+)
+
+
+def _state_transition_result(pr_url: str, new_state: str, code: int, current_state: str) -> Dict[str, Any]:
+    if code == -1:
+        logger.debug(f"No existing cache for: {pr_url}")
+        return {
+            "status": "ignored",
+            "message": "No existing cache entry found",
+            "data": {"pr_url": pr_url},
+        }
+
+    if code == 0:
+        logger.debug(f"Ignoring state change from '{current_state}' to '{new_state}' for: {pr_url}")
+        return {
+            "status": "ignored",
+            "message": f"Cannot change state from '{current_state}' to '{new_state}'",
+            "data": {
+                "pr_url": pr_url,
+                "current_state": current_state,
+                "attempted_state": new_state,
+            },
+        }
+
+    _local_pr_cache.delete(pr_url)
+    logger.debug(f"Successfully updated state to '{new_state}' for: {pr_url}")
+    return {
+        "status": "success",
+        "message": f"Cache updated to state '{new_state}'",
+        "data": {"pr_url": pr_url, "new_state": new_state},
+    }
+
+
 async def update_pr_state_cache(pr_url: str, new_state: str) -> Dict[str, Any]:
     try:
-        current_state = await redis_client.hget(pr_url, "state")
+        code, current_state = await _state_transition_script(
+            keys=[pr_url], args=[new_state, CACHE_INVALIDATION_CHANNEL]
+        )
+        return _state_transition_result(pr_url, new_state, code, current_state)
+    except Exception as e:
+        logger.error(f"Failed to update state for {pr_url}: {e}")
+        return {
+            "status": "error",
+            "message": f"Cache update failed: {str(e)}",
+            "data": {"pr_url": pr_url},
+        }
+
+
+async def update_pr_states_cache(updates: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Apply many (pr_url, new_state) transitions in order in one pipeline, e.g. when replaying a
+    webhook backlog. Returns one result per update, as update_pr_state_cache would.
+    """
+    if not updates:
+        return []
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for pr_url, new_state in updates:
+            await _state_transition_script(
+                keys=[pr_url], args=[new_state, CACHE_INVALIDATION_CHANNEL], client=pipe
+            )
+        replies = await pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to update states for {len(updates)} PR(s): {e}")
+        return [
+            {
+                "status": "error",
+                "message": f"Cache update failed: {str(e)}",
+                "data": {"pr_url": pr_url},
+            }
+            for pr_url, _ in updates
+        ]
+
+    return [
+        _state_transition_result(pr_url, new_state, code, current_state)
+        for (pr_url, new_state), (code, current_state) in zip(updates, replies)
+    ]
+
+
+async def update_pr_cache_fields(pr_url: str, updates: Dict[str, Any]) -> bool:
+    """Update multiple fields in the cached PR data"""
+    try:
+        await redis_binary_client.hset(name=pr_url, mapping=encode_hash(updates, PLAIN_PR_FIELDS))
+        await _publish_invalidation(pr_url)
+
+        logger.debug(f"Successfully updated fields {list(updates.keys())} for: {pr_url}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to update fields for {pr_url}: {e}")
+        return False
+
+
+# Drop the entry unless it was computed for head_sha: a summary of an older commit is never
+# served, not even as last-known-good. head_sha is also recorded as the PR's latest head so a
+# summary still being computed for an older one is not cached (see _set_pr_cache_script).
+# KEYS: entry, latest head. ARGV: head_sha, head TTL. Returns -1 if missing, 0 if current, 1 if deleted.
+_invalidate_script = redis_client.register_script(
+    """
+    if ARGV[1] ~= "" then
+        redis.call("SET", KEYS[2], ARGV[1], "EX", ARGV[2])
+    end
+    local cached_sha = redis.call("HGET", KEYS[1], "head_sha")
+    if not cached_sha then
+        if redis.call("EXISTS", KEYS[1]) == 0 then
+            return -1
+        end
+    elseif cached_sha == ARGV[1] then
+        return 0
+    end
+    return redis.call("DEL", KEYS[1])
+    """
+)
+
+
+async def invalidate_pr_cache(pr_url: str, head_sha: Optional[str]) -> Dict[str, Any]:
+    """Invalidate the cached summary for pr_url if it was not computed for head_sha."""
+    try:
+        result = await _invalidate_script(
+            keys=[pr_url, f"{HEAD_PREFIX}{pr_url}"], args=[head_sha or "", SHA_CACHE_TTL]
+        )
 
-        # Do not update cache if pr_url DNE in redis or PR has already been merged
-        if not current_state:
-            print(f"No existing cache for: {pr_url}")
+        if result == -1:
+            logger.debug(f"No existing cache for: {pr_url}")
             return {
                 "status": "ignored",
                 "message": "No existing cache entry found",
                 "data": {"pr_url": pr_url},
             }
 
-        if current_state == "merged" and new_state == "closed":
-            print(f"Ignoring state change from 'merged' to 'closed' for: {pr_url}")
+        if result == 0:
+            logger.debug(f"Cache already at head {head_sha} for: {pr_url}")
             return {
                 "status": "ignored",
-                "message": "Cannot change state from 'merged' to 'closed'",
-                "data": {
-                    "pr_url": pr_url,
-                    "current_state": current_state,
-                    "attempted_state": new_state,
-                },
+                "message": "Cache entry matches head SHA",
+                "data": {"pr_url": pr_url, "head_sha": head_sha},
             }
 
-        await redis_client.hset(name=pr_url, key="state", value=new_state)
-        print(f"Successfully updated state to '{new_state}' for: {pr_url}")
+        await _publish_invalidation(pr_url)
+        logger.info(f"Invalidated cache for {pr_url} (new head {head_sha})")
         return {
             "status": "success",
-            "message": f"Cache updated to state '{new_state}'",
-            "data": {"pr_url": pr_url, "new_state": new_state},
+            "message": f"Cache invalidated for head '{head_sha}'",
+            "data": {"pr_url": pr_url, "head_sha": head_sha},
         }
     except Exception as e:
-        # logger.error(f"Failed to update state for {pr_url}: {e}")
-        print(f"Failed to update state for {pr_url}: {e}")
+        logger.error(f"Failed to invalidate cache for {pr_url}: {e}")
         return {
             "status": "error",
-            "message": f"Cache update failed: {str(e)}",
+            "message": f"Cache invalidation failed: {str(e)}",
             "data": {"pr_url": pr_url},
         }
 
 
-async def update_pr_cache_fields(pr_url: str, updates: Dict[str, Any]) -> bool:
-    """Update multiple fields in the cached PR data"""
+async def invalidate_branch_pr_caches(
+    repo_full_name: str, branch: str, head_sha: Optional[str]
+) -> Dict[str, Any]:
+    """Invalidate every cached PR whose head is `branch`, after a push moved it to head_sha."""
     try:
-        await redis_client.hset(name=pr_url, mapping=updates)
-
-        print(f"Successfully updated fields {list(updates.keys())} for: {pr_url}")
-        return True
+        pr_urls = await redis_client.smembers(_branch_index_key(repo_full_name, branch))
     except Exception as e:
-        logger.error(f"Failed to update fields for {pr_url}: {e}")
-        return False
+        logger.error(f"Failed to look up PRs for branch {repo_full_name}:{branch}: {e}")
+        return {
+            "status": "error",
+            "message": f"Branch lookup failed: {str(e)}",
+            "data": {"repo": repo_full_name, "branch": branch},
+        }
+
+    if not pr_urls:
+        return {
+            "status": "ignored",
+            "message": "No cached PRs for branch",
+            "data": {"repo": repo_full_name, "branch": branch},
+        }
+
+    results = await asyncio.gather(*(invalidate_pr_cache(pr_url, head_sha) for pr_url in pr_urls))
+    invalidated = [result["data"]["pr_url"] for result in results if result["status"] == "success"]
+    return {
+        "status": "success" if invalidated else "ignored",
+        "message": f"Invalidated {len(invalidated)} of {len(pr_urls)} cached PR(s) for branch '{branch}'",
+        "data": {"repo": repo_full_name, "branch": branch, "invalidated": invalidated},
+    }
 
 
 async def get_pr_cache(pr_url: str) -> Optional[Dict[str, Any]]:
+    if _local_cache_live:
+        pr_cache = _local_pr_cache.get(pr_url)
+        if pr_cache is not None:
+            CACHE_LOOKUPS.labels("local", "hit").inc()
+            logger.debug(f"Local cache HIT for: {pr_url}")
+            return dict(pr_cache)
+
+    local_version = _local_pr_cache.version
     try:
-        pr_cache = await redis_client.hgetall(name=pr_url)
+        raw_cache = await redis_binary_client.hgetall(name=pr_url)
 
-        if not pr_cache:
-            print(f"Cache MISS for: {pr_url}")
-            # logger.info(f"Cache MISS for: {pr_url}")
+        if not raw_cache:
+            _redis_stats["misses"] += 1
+            CACHE_LOOKUPS.labels("redis", "miss").inc()
+            logger.debug(f"Cache MISS for: {pr_url}")
             return None
 
-        print(f"Cache HIT for: {pr_url}")
-        # logger.info(f"Cache HIT for: {pr_url}")
+        _redis_stats["hits"] += 1
+        CACHE_LOOKUPS.labels("redis", "hit").inc()
+        pr_cache = decode_hash(raw_cache)
+        if _local_cache_live:
+            size = sum(len(key) + len(value) for key, value in raw_cache.items())
+            _local_pr_cache.set(pr_url, dict(pr_cache), size, version=local_version)
+        logger.debug(f"Cache HIT for: {pr_url}")
         return pr_cache
 
     except Exception as e:
-        print(f"Failed to retrieve cache for {pr_url}: {e}")
-        # logger.error(f"Failed to retrieve cache for {pr_url}: {e}")
+        logger.error(f"Failed to retrieve cache for {pr_url}: {e}")
         return None
 
 
+async def get_pr_cache_fields(pr_url: str, fields: List[str]) -> Dict[str, Any]:
+    """Only the named fields of the cached PR (HMGET), omitting any that are not set"""
+    pr_cache = _local_pr_cache.get(pr_url) if _local_cache_live else None
+    if pr_cache is not None:
+        return {field: pr_cache[field] for field in fields if field in pr_cache}
+
+    try:
+        values = await redis_binary_client.hmget(pr_url, fields)
+        return {field: decode_value(value) for field, value in zip(fields, values) if value is not None}
+    except Exception as e:
+        logger.error(f"Failed to retrieve cache fields for {pr_url}: {e}")
+        return {}
+
+
 async def del_pr_cache(pr_url: str) -> bool:
     try:
         deleted_count = await redis_client.delete(pr_url)
+        await _publish_invalidation(pr_url)
 
         if deleted_count > 0:
-            print(f"Successfully deleted cache for: {pr_url}")
-            # logger.info(f"Successfully deleted cache for: {pr_url}")
+            logger.info(f"Successfully deleted cache for: {pr_url}")
             return True
         else:
-            print(f"No cache found to delete for: {pr_url}")
-            # logger.warning(f"No cache found to delete for: {pr_url}")
+            logger.warning(f"No cache found to delete for: {pr_url}")
             return False
 
     except Exception as e:
-        print(f"Failed to delete cache for {pr_url}: {e}")
-        # logger.error(f"Failed to delete cache for {pr_url}: {e}")
+        logger.error(f"Failed to delete cache for {pr_url}: {e}")
         return False
+
+
+async def _publish_invalidation(pr_url: str) -> None:
+    """Drop pr_url from this process's tier and tell every other process to do the same"""
+    _local_pr_cache.delete(pr_url)
+    try:
+        await redis_client.publish(CACHE_INVALIDATION_CHANNEL, pr_url)
+    except Exception as e:
+        logger.error(f"Failed to publish cache invalidation for {pr_url}: {e}")
+
+
+async def run_cache_invalidation_listener() -> None:
+    """
+    Keep the local tier coherent with Redis. The tier is only used while subscribed; it is
+    cleared on every (re)subscribe since invalidations may have been missed. Runs until cancelled.
+    """
+    global _local_cache_live
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+            _local_pr_cache.clear()
+            _local_cache_live = True
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    _local_pr_cache.delete(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener disconnected: {e}")
+            await asyncio.sleep(1.0)
+        finally:
+            _local_cache_live = False
+            _local_pr_cache.clear()
+            await pubsub.aclose()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for each summary cache tier"""
+    return {
+        "status": "success",
+        "local": {**_local_pr_cache.stats(), "enabled": _local_cache_live},
+        "redis": dict(_redis_stats),
+    }
+
+
+LEASE_PREFIX = "lease:"
+
+# Compare-and-delete: remove KEYS[1] only while it still holds ARGV[1]. Releases a lease we still
+# own (an expired-and-retaken lease is left alone) and clears our own pre-warm request.
+_delete_if_equal_script = redis_client.register_script(
+    """
+    if redis.call("GET", KEYS[1]) == ARGV[1] then
+        return redis.call("DEL", KEYS[1])
+    end
+    return 0
+    """
+)
+
+
+async def acquire_summary_lease(pr_url: str, token: str, ttl: float) -> bool:
+    """Try to become the worker that computes the summary for pr_url. Fails open if Redis is down."""
+    try:
+        acquired = await redis_client.set(
+            name=f"{LEASE_PREFIX}{pr_url}", value=token, nx=True, px=int(ttl * 1000)
+        )
+        return bool(acquired)
+    except Exception as e:
+        logger.error(f"Failed to acquire summary lease for {pr_url}: {e}")
+        return True
+
+
+async def release_summary_lease(pr_url: str, token: str) -> None:
+    try:
+        await _delete_if_equal_script(keys=[f"{LEASE_PREFIX}{pr_url}"], args=[token])
+    except Exception as e:
+        logger.error(f"Failed to release summary lease for {pr_url}: {e}")
+
+
+async def is_summary_lease_held(pr_url: str) -> bool:
+    """Whether some worker is computing pr_url's summary right now"""
+    try:
+        return bool(await redis_client.exists(f"{LEASE_PREFIX}{pr_url}"))
+    except Exception as e:
+        logger.warning(f"Failed to check summary lease for {pr_url}: {e}")
+        return False
+
+
+async def wait_for_pr_cache(pr_url: str, timeout: float, interval: float) -> Optional[Dict[str, Any]]:
+    """Poll until another worker caches a fresh pr_url or its lease goes away. Returns None on timeout."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while loop.time() < deadline:
+            await asyncio.sleep(interval)
+            pr_cache = decode_hash(await redis_binary_client.hgetall(name=pr_url))
+            if pr_cache and not is_stale(pr_cache):
+                logger.debug(f"Cache filled by another worker for: {pr_url}")
+                return pr_cache
+            if not await redis_client.exists(f"{LEASE_PREFIX}{pr_url}"):
+                return None
+    except Exception as e:
+        logger.error(f"Failed while waiting for cache of {pr_url}: {e}")
+    return None
+
+
+async def get_file_summaries(content_hashes: List[str]) -> Dict[str, str]:
+    """Look up per-file summaries by diff content hash. Returns only the hashes that were found."""
+    if not content_hashes:
+        return {}
+
+    try:
+        summaries = await redis_binary_client.mget([f"{FILE_SUMMARY_PREFIX}{h}" for h in content_hashes])
+        found = {h: decode_value(summary) for h, summary in zip(content_hashes, summaries) if summary}
+        CACHE_LOOKUPS.labels("file_summary", "hit").inc(len(found))
+        CACHE_LOOKUPS.labels("file_summary", "miss").inc(len(content_hashes) - len(found))
+        logger.debug(f"File summary cache: {len(found)}/{len(content_hashes)} hits")
+        return found
+    except Exception as e:
+        logger.error(f"Failed to retrieve file summaries: {e}")
+        return {}
+
+
+async def set_file_summaries(summaries: Dict[str, str]) -> bool:
+    try:
+        pipe = redis_binary_client.pipeline()
+        for content_hash, summary in summaries.items():
+            pipe.set(
+                name=f"{FILE_SUMMARY_PREFIX}{content_hash}", value=encode_value(summary), ex=FILE_SUMMARY_TTL
+            )
+        await pipe.execute()
+        return True
+    except Exception as e:
+        logger.error(f"Failed to cache file summaries: {e}")
+        return False
+
+
+async def get_github_cache(pr_url: str) -> Dict[str, str]:
+    """Last GitHub responses for pr_url with their ETag/Last-Modified validators, or {} if none."""
+    try:
+        return decode_hash(await redis_binary_client.hgetall(name=f"{GITHUB_CACHE_PREFIX}{pr_url}"))
+    except Exception as e:
+        logger.error(f"Failed to retrieve GitHub cache for {pr_url}: {e}")
+        return {}
+
+
+async def set_github_cache(pr_url: str, fields: Dict[str, str]) -> bool:
+    try:
+        plain_fields = [name for name in fields if name not in GITHUB_ENCODED_FIELDS]
+        pipe = redis_binary_client.pipeline()
+        pipe.hset(name=f"{GITHUB_CACHE_PREFIX}{pr_url}", mapping=encode_hash(fields, plain_fields))
+        pipe.expire(name=f"{GITHUB_CACHE_PREFIX}{pr_url}", time=GITHUB_CACHE_TTL)
+        await pipe.execute()
+        return True
+    except Exception as e:
+        logger.error(f"Failed to cache GitHub responses for {pr_url}: {e}")
+        return False
+
+
+async def set_prewarm_head(pr_url: str, head_sha: str) -> bool:
+    """Record the newest head SHA a pre-warm was requested for; older pending pre-warms become no-ops."""
+    try:
+        await redis_client.set(name=f"{PREWARM_PREFIX}{pr_url}", value=head_sha, ex=PREWARM_TTL)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to record pre-warm for {pr_url}: {e}")
+        return False
+
+
+async def get_prewarm_head(pr_url: str) -> Optional[str]:
+    try:
+        return await redis_client.get(f"{PREWARM_PREFIX}{pr_url}")
+    except Exception as e:
+        logger.error(f"Failed to read pre-warm for {pr_url}: {e}")
+        return None
+
+
+async def clear_prewarm_head(pr_url: str, head_sha: str) -> None:
+    # Only clear our own request, so a newer push's pre-warm still runs
+    try:
+        await _delete_if_equal_script(keys=[f"{PREWARM_PREFIX}{pr_url}"], args=[head_sha])
+    except Exception as e:
+        logger.error(f"Failed to clear pre-warm for {pr_url}: {e}")
+
+
+async def record_webhook_delivery(delivery_id: str) -> bool:
+    """
+    Claim a GitHub delivery ID until it is confirmed or forgotten. Returns False if it was already
+    seen (a redelivery); fails open so webhooks are still processed while Redis is down. An
+    unconfirmed claim expires after DELIVERY_CLAIM_TTL, so a crash before queueing loses nothing.
+    """
+    try:
+        return bool(
+            await redis_client.set(f"{DELIVERY_PREFIX}{delivery_id}", 1, nx=True, ex=DELIVERY_CLAIM_TTL)
+        )
+    except Exception as e:
+        logger.error(f"Failed to record webhook delivery {delivery_id}: {e}")
+        return True
+
+
+async def confirm_webhook_delivery(delivery_id: str) -> None:
+    """Keep a claimed delivery ID for WEBHOOK_DELIVERY_TTL once its work is queued"""
+    try:
+        await redis_client.expire(f"{DELIVERY_PREFIX}{delivery_id}", WEBHOOK_DELIVERY_TTL)
+    except Exception as e:
+        logger.error(f"Failed to confirm webhook delivery {delivery_id}: {e}")
+
+
+async def forget_webhook_delivery(delivery_id: str) -> None:
+    """Release a claimed delivery ID whose work could not be queued, so a redelivery is processed"""
+    try:
+        await redis_client.delete(f"{DELIVERY_PREFIX}{delivery_id}")
+    except Exception as e:
+        logger.error(f"Failed to forget webhook delivery {delivery_id}: {e}")
+
+
+async def get_batch_sent(batch_id: str) -> Set[str]:
+    """Parts of a batch reply already delivered, so a retried job does not post them again"""
+    try:
+        return await redis_client.smembers(f"{BATCH_SENT_PREFIX}{batch_id}")
+    except Exception as e:
+        logger.warning(f"Failed to read sent parts of batch {batch_id}: {e}")
+        return set()
+
+
+async def mark_batch_sent(batch_id: str, parts: List[str]) -> None:
+    if not parts:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        pipe.sadd(f"{BATCH_SENT_PREFIX}{batch_id}", *parts)
+        pipe.expire(f"{BATCH_SENT_PREFIX}{batch_id}", BATCH_SENT_TTL)
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to record sent parts of batch {batch_id}: {e}")
+
+
+async def load_cache_scripts() -> None:
+    """Load the Lua scripts at startup so the first webhook does not pay for a NOSCRIPT retry"""
+    try:
+        for script in (
+            _state_transition_script,
+            _invalidate_script,
+            _set_pr_cache_script,
+            _delete_if_equal_script,
+        ):
+            script.sha = await redis_client.script_load(script.script)
+    except Exception as e:
+        logger.error(f"Failed to load cache scripts: {e}")
@@ -0,0 +1,139 @@
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict
+
+from services.cache_service import (
+    invalidate_branch_pr_caches,
+    invalidate_pr_cache,
+    set_prewarm_head,
+    update_pr_state_cache,
+    update_pr_states_cache,
+)
+from services.job_queue import enqueue_job
+from services.slack_service import slack_message_queue
+from utils.config import JOB_QUEUE_ENABLED, PREWARM_DEBOUNCE, PREWARM_ENABLED
+from utils.server_utils import extract_pr_merge_info, merged_pr_numbers
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ACTIONS = ("opened", "reopened", "synchronize")
+
+
+# Runs from the job queue after the webhook route has acknowledged the delivery
+async def process_push(event: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    if event != "push":
+        logger.info(f"Received GitHub event '{event}' - no action taken")
+        return {"status": "ignored", "message": f"Event '{event}' not processed"}
+
+    merge_info = extract_pr_merge_info(payload, event)
+    if merge_info["is_pr_merge"]:
+        # Queue message for the slack channel; delivery is paced per channel
+        slack_msg = f"PR #{merge_info['pr_number']} merged from branch '{merge_info['branch_name']}'"
+        _queue_channel_message(slack_msg, merge_info["pr_url"])
+
+        # A push can carry several merges (e.g. catching up a backlog); mark them all in one pipeline
+        pr_base_url = merge_info["pr_url"].rsplit("/", 1)[0]
+        commit_messages = [commit.get("message", "") for commit in payload.get("commits") or []]
+        pr_urls = [merge_info["pr_url"]] + [
+            f"{pr_base_url}/{number}" for number in merged_pr_numbers(commit_messages)
+        ]
+        cache_results = await update_pr_states_cache(
+            [(pr_url, "merged") for pr_url in dict.fromkeys(pr_urls)]
+        )
+        for cache_result in cache_results:
+            handle_cache_logging(cache_result=cache_result)
+
+        return {
+            "status": "success",
+            "message": "PR merge processed and Slack notification queued",
+            "pr_number": merge_info["pr_number"],
+        }
+
+    # New commits on a PR's head branch make its cached summary stale
+    ref = payload.get("ref", "")
+    repo_full_name = payload.get("repository", {}).get("full_name")
+    if ref.startswith("refs/heads/") and repo_full_name and not payload.get("deleted"):
+        cache_result = await invalidate_branch_pr_caches(
+            repo_full_name, ref[len("refs/heads/") :], payload.get("after")
+        )
+        handle_cache_logging(cache_result=cache_result)
+
+    logger.info(f"Push event received but not a PR merge: {ref}")
+    return {"status": "ignored", "message": "Push event but not a PR merge"}
+
+
+async def process_pull_request(event: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    pr_action = payload.get("action", None)
+    pr_info = payload.get("pull_request", None)
+    if not pr_action or not pr_info:
+        return {"status": "error", "message": "Missing PR action/info."}
+
+    pr_url = pr_info.get("html_url", None)
+    if not pr_url:
+        return {"status": "error", "message": "Missing PR URL."}
+
+    # Queue message for the slack channel; delivery is paced per channel
+    _queue_channel_message(f"PR {pr_action} at {pr_url}", pr_url)
+
+    if pr_action == "synchronize":
+        # New commits pushed: drop the cached summary unless it is already for the new head
+        head_sha = pr_info.get("head", {}).get("sha")
+        cache_result = await invalidate_pr_cache(pr_url, head_sha)
+    else:
+        # Update the pr cache w/ the pr_action
+        cache_result = await update_pr_state_cache(pr_url, pr_action)
+    handle_cache_logging(cache_result=cache_result)
+
+    if pr_action in PREWARM_ACTIONS:
+        await schedule_prewarm(pr_url, pr_info.get("head", {}).get("sha"))
+
+    logger.info(f"Received GitHub event '{event}'.")
+    return {"status": "success", "message": f"Event '{event}' processed - message queued!"}
+
+
+async def process_pr_review(event: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    review = payload.get("review") or payload.get("comment") or {}
+    pr_url = (payload.get("pull_request") or {}).get("html_url")
+    logger.info(
+        f"Received GitHub event '{event}' ({payload.get('action')}) for {pr_url}",
+        extra={"reviewer": (review.get("user") or {}).get("login"), "review_state": review.get("state")},
+    )
+    return {"status": "received"}
+
+
+# Webhook route -> processor, keyed by the job payload's "route"
+WEBHOOK_PROCESSORS: Dict[str, Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    "push": process_push,
+    "pull_request": process_pull_request,
+    "pr_review": process_pr_review,
+}
+
+
+def _queue_channel_message(slack_msg: str, pr_url: str) -> None:
+    # Events for the same PR collapse to the latest while they wait to be posted
+    channel = os.getenv("SLACK_GPT_BOT_CHANNEL_ID")
+    if not slack_message_queue.enqueue(slack_msg, channel, coalesce_key=pr_url):
+        # Raising lets the job queue retry once the channel queue has drained
+        raise RuntimeError("Slack message queue unavailable")
+
+
+def handle_cache_logging(cache_result: Dict[str, Any]) -> None:
+    if cache_result["status"] == "success":
+        logger.debug(f"Cache updated: {cache_result['message']}")
+    elif cache_result["status"] == "ignored":
+        logger.debug(f"Cache update skipped: {cache_result['message']}")
+    elif cache_result["status"] == "error":
+        logger.warning(f"Cache update failed: {cache_result['message']}")
+        # Don't return error - cache failures shouldn't stop webhook processing
+
+
+async def schedule_prewarm(pr_url: str, head_sha: str) -> None:
+    """
+    Queue a background summary of pr_url after PREWARM_DEBOUNCE seconds. Only the job for the latest
+    head SHA does any work, so a burst of pushes costs one summary.
+    """
+    if not (PREWARM_ENABLED and JOB_QUEUE_ENABLED and head_sha):
+        return
+
+    if await set_prewarm_head(pr_url, head_sha):
+        await enqueue_job("prewarm_pr", {"pr_url": pr_url, "head_sha": head_sha}, delay=PREWARM_DEBOUNCE)
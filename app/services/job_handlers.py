@@ -0,0 +1,69 @@
+import logging
+from typing import Any, Dict
+
+from services.cache_service import clear_prewarm_head, get_prewarm_head
+from services.github_webhook_service import WEBHOOK_PROCESSORS
+from services.job_queue import JobHandler, enqueue_job, is_final_attempt
+from services.llm_scheduler import LLMOverloadedError, llm_scheduler
+from services.pr_service import PRService
+from utils.config import PREWARM_DEBOUNCE
+
+logger = logging.getLogger(__name__)
+
+pr_service = PRService()
+
+
+async def handle_summarize_pr(payload: Dict[str, Any]) -> None:
+    # Transient failures are retried by the queue; the user only hears about the last attempt's
+    await pr_service.process_pr_summary(
+        payload["pr_url"],
+        payload["response_url"],
+        channel_id=payload.get("channel_id"),
+        raise_transient=not is_final_attempt(),
+    )
+
+
+async def handle_summarize_pr_batch(payload: Dict[str, Any]) -> None:
+    await pr_service.process_pr_batch(
+        payload["pr_urls"],
+        payload["response_url"],
+        channel_id=payload.get("channel_id"),
+        compare_url=payload.get("compare_url"),
+        release_summary=payload.get("release_summary", False),
+    )
+
+
+async def handle_prewarm_pr(payload: Dict[str, Any]) -> None:
+    pr_url, head_sha = payload["pr_url"], payload["head_sha"]
+
+    # Debounce: a newer push re-queued this PR, or the request expired
+    if await get_prewarm_head(pr_url) != head_sha:
+        logger.info(f"Skipping superseded pre-warm for {pr_url} at {head_sha[:7]}")
+        return
+
+    # Pre-warming only uses idle LLM capacity; try again later rather than queue behind people
+    if llm_scheduler.queue_depth():
+        await enqueue_job("prewarm_pr", payload, delay=PREWARM_DEBOUNCE)
+        return
+
+    try:
+        await pr_service.prewarm_pr_summary(pr_url, head_sha)
+    except LLMOverloadedError as e:
+        logger.warning(f"Pre-warm for {pr_url} shed: {e}")
+        await enqueue_job("prewarm_pr", payload, delay=PREWARM_DEBOUNCE)
+        return
+    await clear_prewarm_head(pr_url, head_sha)
+
+
+async def handle_github_webhook(payload: Dict[str, Any]) -> None:
+    result = await WEBHOOK_PROCESSORS[payload["route"]](payload["event"], payload["payload"])
+    logger.debug(f"Processed GitHub delivery {payload.get('delivery_id')}: {result.get('message', result['status'])}")
+
+
+# Job type -> handler, shared by the standalone worker and the embedded one
+JOB_HANDLERS: Dict[str, JobHandler] = {
+    "summarize_pr": handle_summarize_pr,
+    "summarize_pr_batch": handle_summarize_pr_batch,
+    "prewarm_pr": handle_prewarm_pr,
+    "github_webhook": handle_github_webhook,
+}
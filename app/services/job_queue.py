@@ -0,0 +1,302 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from redis.exceptions import ResponseError
+
+from utils.config import (
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_TIMEOUT,
+    JOB_RETRY_BASE_DELAY,
+    JOB_VISIBILITY_TIMEOUT,
+    WORKER_CONCURRENCY,
+    WORKER_SHUTDOWN_TIMEOUT,
+)
+from utils.redis_client import redis_client
+from utils.telemetry import JOBS_IN_FLIGHT, RETRIES
+
+logger = logging.getLogger(__name__)
+
+JOB_STREAM = "jobs:stream"
+JOB_GROUP = "jobs:workers"
+DELAYED_JOBS_KEY = "jobs:delayed"  # Sorted set of serialized jobs scored by due time
+DEAD_LETTER_STREAM = "jobs:dead"
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Attempt number of the job the current task is running, for handlers that report failures
+_current_attempt: ContextVar[int] = ContextVar("current_job_attempt", default=JOB_MAX_ATTEMPTS - 1)
+
+
+def is_final_attempt() -> bool:
+    """Whether a failure in the running job will be dead-lettered rather than retried"""
+    return _current_attempt.get() + 1 >= JOB_MAX_ATTEMPTS
+
+# Move due delayed jobs onto the stream atomically, so a crash cannot lose or duplicate them
+_promote_delayed_script = redis_client.register_script(
+    """
+    local due = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+    for _, member in ipairs(due) do
+        redis.call("ZREM", KEYS[1], member)
+        local job = cjson.decode(member)
+        redis.call("XADD", KEYS[2], "*", "type", job.type, "payload", job.payload,
+            "attempt", job.attempt, "enqueued_at", job.enqueued_at)
+    end
+    return #due
+    """
+)
+
+
+def _job_fields(job_type: str, payload: Dict[str, Any], attempt: int) -> Dict[str, str]:
+    return {
+        "type": job_type,
+        "payload": json.dumps(payload),
+        "attempt": str(attempt),
+        "enqueued_at": str(time.time()),
+    }
+
+
+async def enqueue_job(
+    job_type: str, payload: Dict[str, Any], delay: float = 0.0, attempt: int = 0
+) -> Optional[str]:
+    """Queue a job, optionally `delay` seconds from now. Returns its id, or None if Redis is unavailable."""
+    fields = _job_fields(job_type, payload, attempt)
+    try:
+        if delay > 0:
+            job_id = uuid.uuid4().hex  # Keeps identical delayed jobs distinct in the sorted set
+            member = json.dumps({**fields, "id": job_id})
+            await redis_client.zadd(DELAYED_JOBS_KEY, {member: time.time() + delay})
+            return job_id
+
+        return await redis_client.xadd(JOB_STREAM, fields)
+    except Exception as e:
+        logger.warning(f"Failed to enqueue {job_type} job: {e}")
+        return None
+
+
+async def ensure_consumer_group() -> None:
+    try:
+        await redis_client.xgroup_create(JOB_STREAM, JOB_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def get_queue_stats() -> Dict[str, Any]:
+    """Queue depth: waiting, in-progress (pending), delayed and dead-lettered jobs."""
+    try:
+        pipe = redis_client.pipeline()
+        pipe.xlen(JOB_STREAM)
+        pipe.zcard(DELAYED_JOBS_KEY)
+        pipe.xlen(DEAD_LETTER_STREAM)
+        stream_length, delayed, dead_letter = await pipe.execute()
+
+        group = {}
+        try:
+            groups = await redis_client.xinfo_groups(JOB_STREAM)
+            group = next((g for g in groups if g["name"] == JOB_GROUP), {})
+        except ResponseError:
+            pass  # Stream does not exist yet
+
+        return {
+            "status": "success",
+            "stream_length": stream_length,
+            "waiting": group.get("lag", stream_length),
+            "in_progress": group.get("pending", 0),
+            "consumers": group.get("consumers", 0),
+            "delayed": delayed,
+            "dead_letter": dead_letter,
+        }
+    except Exception as e:
+        logger.warning(f"Failed to read queue stats: {e}")
+        return {"status": "error", "message": f"Queue stats unavailable: {str(e)}"}
+
+
+async def count_live_consumers() -> int:
+    """Workers that have polled the queue within JOB_VISIBILITY_TIMEOUT; 0 if Redis cannot say"""
+    try:
+        consumers = await redis_client.xinfo_consumers(JOB_STREAM, JOB_GROUP)
+    except Exception:
+        return 0  # No stream or group yet, or Redis is unavailable
+    return sum(1 for consumer in consumers if consumer["idle"] < JOB_VISIBILITY_TIMEOUT * 1000)
+
+
+class JobWorker:
+    """
+    Consumes jobs from the Redis stream as part of a consumer group, up to `concurrency` at a time.
+    Running jobs are heartbeated; jobs left pending longer than JOB_VISIBILITY_TIMEOUT (crashed
+    worker) are reclaimed. Failed jobs are retried with exponential backoff, then dead-lettered.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, JobHandler],
+        concurrency: int = WORKER_CONCURRENCY,
+        consumer: Optional[str] = None,
+    ):
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    async def run(self) -> None:
+        await ensure_consumer_group()
+        logger.info(f"Worker {self.consumer} consuming {JOB_STREAM} with concurrency {self.concurrency}")
+        maintenance = asyncio.create_task(self._maintenance_loop())
+
+        try:
+            while not self._stopping.is_set():
+                await self._slots.acquire()
+                try:
+                    response = await redis_client.xreadgroup(
+                        JOB_GROUP,
+                        self.consumer,
+                        {JOB_STREAM: ">"},
+                        count=1,
+                        block=int(JOB_POLL_TIMEOUT * 1000),
+                    )
+                except Exception as e:
+                    self._slots.release()
+                    logger.warning(f"Failed to read jobs: {e}")
+                    await asyncio.sleep(JOB_POLL_TIMEOUT)
+                    continue
+
+                messages = [message for _, stream_messages in response or [] for message in stream_messages]
+                if not messages:
+                    self._slots.release()
+                    continue
+                for message_id, fields in messages:
+                    self._spawn(message_id, fields)
+        finally:
+            maintenance.cancel()
+            if self._tasks:
+                logger.info(f"Waiting for {len(self._tasks)} running job(s) to finish")
+                await asyncio.wait(self._tasks, timeout=WORKER_SHUTDOWN_TIMEOUT)
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _spawn(self, message_id: str, fields: Dict[str, str]) -> None:
+        task = asyncio.create_task(self._process(message_id, fields))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, message_id: str, fields: Dict[str, str]) -> None:
+        job_type = fields.get("type", "")
+        attempt = int(fields.get("attempt", "0"))
+        heartbeat = asyncio.create_task(self._heartbeat(message_id))
+        JOBS_IN_FLIGHT.inc()
+        _current_attempt.set(attempt)
+        done = False
+
+        try:
+            handler = self.handlers.get(job_type)
+            if handler is None:
+                done = await self._dead_letter(fields, f"No handler for job type '{job_type}'")
+            else:
+                await handler(json.loads(fields["payload"]))
+                done = True
+        except Exception as e:
+            logger.warning(f"Job {message_id} ({job_type}) failed on attempt {attempt + 1}: {e}")
+            done = await self._retry_or_dead_letter(fields, attempt, str(e))
+        finally:
+            heartbeat.cancel()
+            JOBS_IN_FLIGHT.dec()
+            # Left pending if the retry could not be queued, so the job is reclaimed instead of lost
+            if done:
+                await self._ack(message_id)
+            self._slots.release()
+
+    async def _retry_or_dead_letter(self, fields: Dict[str, str], attempt: int, error: str) -> bool:
+        """Hand a failed job on; False if it could not be, so it must stay pending"""
+        if attempt + 1 >= JOB_MAX_ATTEMPTS:
+            return await self._dead_letter(fields, error)
+
+        delay = JOB_RETRY_BASE_DELAY * (2**attempt) * random.uniform(0.5, 1.5)
+        RETRIES.labels("job").inc()
+        job_id = await enqueue_job(fields["type"], json.loads(fields["payload"]), delay=delay, attempt=attempt + 1)
+        return job_id is not None
+
+    async def _dead_letter(self, fields: Dict[str, str], error: str) -> bool:
+        logger.error(f"Dead-lettering {fields.get('type')} job: {error}")
+        try:
+            await redis_client.xadd(DEAD_LETTER_STREAM, {**fields, "error": error, "failed_at": str(time.time())})
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to dead-letter job: {e}")
+            return False
+
+    async def _ack(self, message_id: str) -> None:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.xack(JOB_STREAM, JOB_GROUP, message_id)
+            pipe.xdel(JOB_STREAM, message_id)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to ack job {message_id}: {e}")
+
+    async def _heartbeat(self, message_id: str) -> None:
+        # Re-claiming our own message resets its idle time, so long jobs are not reclaimed mid-run
+        while True:
+            await asyncio.sleep(JOB_VISIBILITY_TIMEOUT / 3)
+            try:
+                await redis_client.xclaim(
+                    JOB_STREAM, JOB_GROUP, self.consumer, 0, [message_id], justid=True
+                )
+            except Exception as e:
+                logger.warning(f"Failed to heartbeat job {message_id}: {e}")
+
+    async def _maintenance_loop(self) -> None:
+        last_reclaim = 0.0
+        while True:
+            try:
+                await _promote_delayed_script(keys=[DELAYED_JOBS_KEY, JOB_STREAM], args=[time.time(), 100])
+
+                if time.monotonic() - last_reclaim >= JOB_VISIBILITY_TIMEOUT / 2:
+                    last_reclaim = time.monotonic()
+                    await self._reclaim_stale_jobs()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Job queue maintenance failed: {e}")
+            await asyncio.sleep(1.0)
+
+    async def _reclaim_stale_jobs(self) -> None:
+        # Only claim as many as we have free slots for; the rest stay claimable by other workers
+        while not self._slots.locked():
+            _, messages, *_ = await redis_client.xautoclaim(
+                JOB_STREAM,
+                JOB_GROUP,
+                self.consumer,
+                min_idle_time=int(JOB_VISIBILITY_TIMEOUT * 1000),
+                count=1,
+            )
+            if not messages:
+                return
+
+            message_id, fields = messages[0]
+            if not fields:
+                await self._ack(message_id)  # Deleted from the stream while pending
+                continue
+
+            # A job that keeps taking its worker down goes to the dead-letter stream
+            pending = await redis_client.xpending_range(
+                JOB_STREAM, JOB_GROUP, min=message_id, max=message_id, count=1
+            )
+            if pending and pending[0]["times_delivered"] > JOB_MAX_ATTEMPTS:
+                if await self._dead_letter(fields, "Exceeded delivery attempts"):
+                    await self._ack(message_id)
+                continue
+
+            logger.info(f"Reclaimed stale job {message_id} ({fields.get('type')})")
+            await self._slots.acquire()
+            self._spawn(message_id, fields)
@@ -0,0 +1,31 @@
+import asyncio
+from typing import Optional
+
+from services.cache_service import load_cache_scripts, run_cache_invalidation_listener
+from services.slack_service import slack_message_queue
+from utils.config import EVENT_LOOP_LAG_INTERVAL
+from utils.http_clients import close_http_clients, init_http_clients
+from utils.telemetry import init_tracing, run_event_loop_lag_probe, shutdown_tracing
+
+_cache_listener: Optional[asyncio.Task] = None
+_lag_probe: Optional[asyncio.Task] = None
+
+
+# Shared process setup for the web app and the standalone worker
+async def startup() -> None:
+    global _cache_listener, _lag_probe
+    init_tracing()
+    init_http_clients()
+    slack_message_queue.start()
+    await load_cache_scripts()
+    _cache_listener = asyncio.create_task(run_cache_invalidation_listener())
+    _lag_probe = asyncio.create_task(run_event_loop_lag_probe(EVENT_LOOP_LAG_INTERVAL))
+
+
+async def shutdown() -> None:
+    for task in (_cache_listener, _lag_probe):
+        if task:
+            task.cancel()
+    await slack_message_queue.stop()
+    await close_http_clients()
+    shutdown_tracing()
@@ -0,0 +1,141 @@
+import asyncio
+import heapq
+import itertools
+import time
+from enum import IntEnum
+from typing import Awaitable, Callable, List, Tuple, TypeVar
+
+from utils.config import (
+    LLM_MAX_QUEUE_DEPTH,
+    LLM_MAX_WAIT_BACKGROUND,
+    LLM_MAX_WAIT_INTERACTIVE,
+    LLM_MAX_WAIT_PREWARM,
+    LLM_TOKENS_PER_MINUTE,
+    OPENAI_MAX_CONCURRENCY,
+)
+from utils.rate_limiter import TokenBucket
+from utils.telemetry import LLM_QUEUE_DEPTH, STAGE_SECONDS
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Lower values are served first"""
+
+    INTERACTIVE = 0  # A person is waiting in Slack
+    BACKGROUND = 1  # Webhook-triggered work
+    PREWARM = 2  # Speculative cache fills
+
+
+MAX_WAIT = {
+    Priority.INTERACTIVE: LLM_MAX_WAIT_INTERACTIVE,
+    Priority.BACKGROUND: LLM_MAX_WAIT_BACKGROUND,
+    Priority.PREWARM: LLM_MAX_WAIT_PREWARM,
+}
+
+
+class LLMOverloadedError(Exception):
+    """Raised instead of queueing LLM work that could not start within its priority's wait limit"""
+
+
+class LLMScheduler:
+    """
+    Admission control for completions: estimated tokens are drawn from a tokens-per-minute bucket,
+    then at most `max_concurrency` run at once. Waiting work is started highest priority first.
+    Both waits share the priority's MAX_WAIT; work that cannot start within it is shed.
+    """
+
+    def __init__(self, max_concurrency: int, tokens_per_minute: int):
+        self.max_concurrency = max_concurrency
+        self._running = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []  # Heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._tokens = TokenBucket(rate=tokens_per_minute / 60, capacity=tokens_per_minute)
+        self._avg_duration = 5.0  # Seconds; moving average of completion time
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _expected_wait(self, priority: Priority) -> float:
+        ahead = sum(1 for p, _, future in self._waiters if p <= priority and not future.done())
+        return (ahead + 1) / self.max_concurrency * self._avg_duration
+
+    async def run(
+        self, priority: Priority, estimated_tokens: int, fn: Callable[[], Awaitable[T]]
+    ) -> T:
+        """Run fn once admitted. Raises LLMOverloadedError if it cannot start in time."""
+        queued_at = time.monotonic()
+        deadline = queued_at + MAX_WAIT[priority]
+        # Tokens come before a slot, so an exhausted TPM budget sheds work instead of idling slots
+        await self._admit_tokens(priority, estimated_tokens, deadline)
+        try:
+            await self._admit_slot(priority, deadline)
+        except BaseException:
+            self._tokens.refund(estimated_tokens)
+            raise
+        STAGE_SECONDS.labels("llm_queue").observe(time.monotonic() - queued_at)
+
+        try:
+            started = time.monotonic()
+            result = await fn()
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - started)
+            return result
+        finally:
+            self._release()
+
+    async def _admit_tokens(self, priority: Priority, estimated_tokens: int, deadline: float) -> None:
+        """
+        Draw estimated_tokens from the TPM bucket by the deadline. Interactive work may borrow
+        against the refill; other priorities wait until the tokens are there, so they never push
+        an interactive request's wait out.
+        """
+        while True:
+            remaining = deadline - time.monotonic()
+            max_delay = remaining if priority == Priority.INTERACTIVE else 0.0
+            delay = self._tokens.reserve(estimated_tokens, max_delay)
+            if delay is not None:
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                return
+
+            wait = self._tokens.time_until(estimated_tokens)
+            if priority == Priority.INTERACTIVE or wait > remaining:
+                raise LLMOverloadedError(f"LLM token budget exhausted for the next {wait:.0f}s")
+            await asyncio.sleep(wait)
+
+    async def _admit_slot(self, priority: Priority, deadline: float) -> None:
+        if self._running < self.max_concurrency:
+            self._running += 1
+            return
+
+        max_wait = deadline - time.monotonic()
+        if self.queue_depth() >= LLM_MAX_QUEUE_DEPTH:
+            raise LLMOverloadedError(f"LLM queue full ({self.queue_depth()} waiting)")
+        expected_wait = self._expected_wait(priority)
+        if expected_wait > max_wait:
+            raise LLMOverloadedError(f"Expected LLM wait {expected_wait:.0f}s exceeds {max_wait:.0f}s")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            # The releasing caller hands its slot straight to us
+            await asyncio.wait_for(future, timeout=max_wait)
+        except asyncio.TimeoutError:
+            raise LLMOverloadedError(f"No LLM capacity within {MAX_WAIT[priority]:.0f}s")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # Granted a slot just as we were cancelled
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._running -= 1
+
+
+# Shared across every OpenAIService instance so the limits apply per worker process
+llm_scheduler = LLMScheduler(OPENAI_MAX_CONCURRENCY, LLM_TOKENS_PER_MINUTE)
+LLM_QUEUE_DEPTH.set_function(llm_scheduler.queue_depth)
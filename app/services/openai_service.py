@@ -1,41 +1,244 @@
 # Handles OpenAI API calls
-from openai import OpenAI
+import asyncio
+import httpx
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    InternalServerError,
+    RateLimitError,
+)
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from services.llm_scheduler import LLMOverloadedError, Priority, llm_scheduler
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.config import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    OPENAI_BASE_URL,
+    OPENAI_MAX_RETRIES,
+    OPENAI_MODEL,
+    OPENAI_TIMEOUT,
+)
+from utils.diff_chunker import DiffChunk, estimate_tokens
+from utils.http_clients import count_rate_limits
+from utils.summary_schema import (
+    FileChange,
+    FileSummaries,
+    MergedSummary,
+    PRSummary,
+    ReleaseSummary,
+    parse_partial_json,
+    render_summary,
+    response_format,
+)
+from utils.telemetry import LLM_TOKENS, RETRIES, span
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class CompletionTruncatedError(ValueError):
+    """The completion stopped at max_tokens, so its structured reply is incomplete"""
+
+
+# OpenAI failures left over after the SDK's own retries that a later attempt may not hit
+OPENAI_OUTAGE_ERRORS = (APIConnectionError, InternalServerError, RateLimitError)
+
+# Upstream outages (not bad requests) open the circuit. It wraps only the request itself, not
+# the scheduler's queueing, and only an actual reply from OpenAI closes it again.
+openai_breaker = CircuitBreaker(
+    "OpenAI",
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    is_failure=lambda e: isinstance(e, OPENAI_OUTAGE_ERRORS + (TimeoutError,)),
+    is_response=lambda e: isinstance(e, (APIStatusError, CompletionTruncatedError)),
+)
+
+# Called each time a streamed completion grows, with a function returning the progress text.
+# Building that text costs O(length), so receivers only call it when they will show the result.
+ProgressCallback = Callable[[Callable[[], str]], None]
+
+
+# The SDK retries internally and numbers each attempt in this header
+async def _count_retries(request: httpx.Request) -> None:
+    if int(request.headers.get("x-stainless-retry-count", "0")) > 0:
+        RETRIES.labels("openai").inc()
+
+
+def _record_usage(usage) -> None:
+    if usage is not None:
+        LLM_TOKENS.labels("prompt").inc(usage.prompt_tokens)
+        LLM_TOKENS.labels("completion").inc(usage.completion_tokens)
+
+
+SYSTEM_PROMPT = "You are a senior software engineer reviewing pull requests. Analyze the code changes and provide clear, concise summaries."
 
 
 class OpenAIService:
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=OPENAI_BASE_URL,
+            http_client=DefaultAsyncHttpxClient(
+                event_hooks={"request": [_count_retries], "response": [count_rate_limits("openai")]}
+            ),
+            timeout=OPENAI_TIMEOUT,
+            max_retries=OPENAI_MAX_RETRIES,
+        )
+
+    async def _complete(
+        self,
+        prompt: str,
+        max_tokens: int,
+        timeout: Optional[float] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        on_progress: Optional[ProgressCallback] = None,
+        output_model: Optional[Type[BaseModel]] = None,
+        model: Optional[str] = None,
+    ) -> str:
+        """
+        Run one chat completion once the scheduler admits it at `priority`; raises
+        LLMOverloadedError if it is shed and CircuitOpenError while OpenAI is failing. `timeout`
+        bounds the call itself (including client retries) and raises TimeoutError when exceeded.
+        With `on_progress` the completion is streamed; with `output_model` the reply is JSON
+        constrained to that model's schema. `model` overrides OPENAI_MODEL. Cancelling the awaiting task aborts the in-flight request.
+        """
+        request = {
+            "model": model or OPENAI_MODEL,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            "max_tokens": max_tokens,
+            "temperature": 0.3,
+        }
+        if output_model is not None:
+            request["response_format"] = response_format(output_model)
+        estimated_tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt) + max_tokens
+        # Fail fast without queueing while the circuit is open
+        openai_breaker.check()
+        try:
+            return await llm_scheduler.run(
+                priority,
+                estimated_tokens,
+                lambda: openai_breaker.call(
+                    lambda: asyncio.wait_for(
+                        self._create_completion(request, on_progress),
+                        timeout=timeout or OPENAI_TIMEOUT,
+                    )
+                ),
+            )
+        except (asyncio.TimeoutError, APITimeoutError):
+            raise TimeoutError("OpenAI completion timed out")
+
+    async def _complete_structured(
+        self,
+        prompt: str,
+        output_model: Type[ModelT],
+        max_tokens: int,
+        timeout: Optional[float] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        on_progress: Optional[ProgressCallback] = None,
+        model: Optional[str] = None,
+    ) -> ModelT:
+        """
+        Complete into a validated `output_model`. While streaming, on_progress gets the summary
+        rendered from the partial JSON received so far; it is only parsed when an edit is sent. Raises ValueError if the reply does not
+        match the schema.
+        """
+
+        def on_text(text: Callable[[], str]) -> None:
+            on_progress(lambda: render_summary(parse_partial_json(text())))
+
+        response_text = await self._complete(
+            prompt,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            priority=priority,
+            on_progress=on_text if on_progress else None,
+            output_model=output_model,
+            model=model,
+        )
+        try:
+            return output_model.model_validate_json(response_text)
+        except ValidationError as e:
+            raise ValueError(f"OpenAI reply did not match the {output_model.__name__} schema: {e}")
 
-    def summarize_pr(self, title: str, description: str, diff_content: str) -> Dict:
+    async def _create_completion(
+        self, request: Dict[str, Any], on_progress: Optional[ProgressCallback]
+    ) -> str:
+        with span("llm_call", model=request["model"], streamed=on_progress is not None):
+            if on_progress is None:
+                response = await self.client.chat.completions.create(**request)
+                _record_usage(response.usage)
+                if response.choices[0].finish_reason == "length":
+                    raise CompletionTruncatedError(f"Completion hit max_tokens={request['max_tokens']}")
+                return response.choices[0].message.content
+
+            stream = await self.client.chat.completions.create(
+                **request, stream=True, stream_options={"include_usage": True}
+            )
+            pieces: List[str] = []
+            finish_reason = None
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    pieces.append(chunk.choices[0].delta.content)
+                    on_progress(lambda: "".join(pieces))
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    finish_reason = chunk.choices[0].finish_reason
+                # Only the final chunk carries usage
+                _record_usage(chunk.usage)
+            if finish_reason == "length":
+                raise CompletionTruncatedError(f"Completion hit max_tokens={request['max_tokens']}")
+            return "".join(pieces)
+
+    async def summarize_pr(
+        self,
+        title: str,
+        description: str,
+        diff_content: str,
+        timeout: Optional[float] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        on_progress: Optional[ProgressCallback] = None,
+        model: Optional[str] = None,
+        max_tokens: int = 1500,
+    ) -> PRSummary | Dict:
         """
-        Summarize a PR using OpenAI, providing both file-level and overall summaries
+        Summarize a PR using OpenAI, providing both file-level and overall summaries.
+        `model` and `max_tokens` are set by the summary route (see services/summary_router.py).
         """
         try:
             # Create the prompt for OpenAI
             prompt = self._create_summarization_prompt(title, description, diff_content)
 
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # or gpt-4o for better quality
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a senior software engineer reviewing pull requests. Analyze the code changes and provide clear, concise summaries.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                max_tokens=1500,
-                temperature=0.3,
+            return await self._complete_structured(
+                prompt,
+                PRSummary,
+                max_tokens=max_tokens,
+                timeout=timeout,
+                priority=priority,
+                on_progress=on_progress,
+                model=model,
             )
 
-            # Return the response - do not worry about using parsing for now
-            return response.choices[0].message.content
-            # return self._parse_openai_response(response.choices[0].message.content)
+        except (
+            TimeoutError,
+            LLMOverloadedError,
+            CircuitOpenError,
+            CompletionTruncatedError,
+            *OPENAI_OUTAGE_ERRORS,
+        ):
+            # Let the caller retry, report or (for truncation) re-route these instead of caching an error summary
+            raise
 
         except Exception as e:
             return {
@@ -44,6 +247,76 @@ class OpenAIService:
                 "file_summaries": [],
             }
 
+    async def summarize_chunk(
+        self,
+        title: str,
+        chunk: DiffChunk,
+        timeout: Optional[float] = None,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> Dict[int, str]:
+        """
+        Map step: summarize every file in one diff chunk. Returns {position in chunk.file_paths:
+        summary} for the files the model covered. Errors propagate so failures are never cached.
+        """
+        prompt = self._create_chunk_summarization_prompt(title, chunk)
+        max_tokens = min(150 * len(chunk.file_paths) + 150, 2000)
+        result = await self._complete_structured(
+            prompt, FileSummaries, max_tokens=max_tokens, timeout=timeout, priority=priority
+        )
+
+        summaries: Dict[int, str] = {}
+        for file_change in result.file_changes:
+            position = file_change.file_number - 1
+            if 0 <= position < len(chunk.file_paths):
+                summaries.setdefault(position, file_change.description)
+
+        # A single-file chunk needs no numbering
+        if len(chunk.file_paths) == 1 and not summaries and len(result.file_changes) == 1:
+            summaries[0] = result.file_changes[0].description
+        return summaries
+
+    async def merge_file_summaries(
+        self,
+        title: str,
+        description: str,
+        file_summaries: List[Tuple[str, str]],
+        timeout: Optional[float] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> PRSummary:
+        """
+        Reduce step: write the overall and technical summary across the per-file summaries. The
+        file changes are the map step's own, so the reply stays short however many files there are.
+        """
+        prompt = self._create_merge_prompt(title, description, file_summaries)
+        merged = await self._complete_structured(
+            prompt,
+            MergedSummary,
+            max_tokens=800,
+            timeout=timeout,
+            priority=priority,
+            on_progress=on_progress,
+        )
+        return PRSummary(
+            overall_summary=merged.overall_summary,
+            file_changes=[
+                FileChange(filename=file_path, description=summary) for file_path, summary in file_summaries
+            ],
+            technical_details=merged.technical_details,
+        )
+
+    async def summarize_release(
+        self,
+        pr_summaries: List[Tuple[str, str]],
+        timeout: Optional[float] = None,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> ReleaseSummary:
+        """Combine (PR link, overall summary) pairs into one release summary. Errors propagate."""
+        prompt = self._create_release_prompt(pr_summaries)
+        return await self._complete_structured(
+            prompt, ReleaseSummary, max_tokens=1000, timeout=timeout, priority=priority
+        )
+
     def _create_summarization_prompt(
         self, title: str, description: str, diff_content: str
     ) -> str:
@@ -60,18 +333,10 @@ class OpenAIService:
             {diff_content}
             ```
 
-            Please provide your analysis in the following format:
-
-            **OVERALL SUMMARY:**
-            [A 1-2 sentence summary of what this PR accomplishes]
-
-            **FILE CHANGES:**
-            For each file that was modified, provide:
-            - **filename**: Brief description of what changed in this file
-            - **filename**: Brief description of what changed in this file
-
-            **TECHNICAL DETAILS:**
-            [Any important technical notes, potential impacts, or concerns]
+            Reply in JSON with:
+            - overall_summary: a 1-2 sentence summary of what this PR accomplishes
+            - file_changes: one entry per modified file, with its filename and a brief description of what changed in it
+            - technical_details: any important technical notes, potential impacts, or concerns
 
             Focus on:
             1. What functionality was added, modified, or removed
@@ -83,86 +348,59 @@ class OpenAIService:
             Keep descriptions clear and concise. Focus on the business logic and functional changes rather than minor formatting.
         """
 
-    def _parse_openai_response(self, response_text: str) -> Dict:
-        """Parse OpenAI response into structured format"""
-        try:
-            sections = response_text.split("**")
-
-            overall_summary = ""
-            file_summaries = []
-            technical_details = ""
-
-            current_section = None
-
-            for section in sections:
-                section = section.strip()
-                if section.upper().startswith("OVERALL SUMMARY"):
-                    current_section = "overall"
-                elif section.upper().startswith("FILE CHANGES"):
-                    current_section = "files"
-                elif section.upper().startswith("TECHNICAL DETAILS"):
-                    current_section = "technical"
-                elif section and current_section:
-                    if current_section == "overall":
-                        overall_summary = section.strip()
-                    elif current_section == "files":
-                        file_summaries.extend(self._parse_file_changes(section))
-                    elif current_section == "technical":
-                        technical_details = section.strip()
+    def _create_chunk_summarization_prompt(self, title: str, chunk: DiffChunk) -> str:
+        """Create a prompt summarizing each numbered file in one chunk of a larger diff"""
+        file_sections = "\n\n".join(
+            f"### File {number}: {file_path}\n```diff\n{part}\n```"
+            for number, (file_path, part) in enumerate(zip(chunk.file_paths, chunk.parts), start=1)
+        )
+        return f"""
+            Summarize the changes to each file in this part of the pull request "{title}".
+            Some files may only show part of their changes.
 
-            return {
-                "overall_summary": overall_summary,
-                "file_summaries": file_summaries,
-                "technical_details": technical_details,
-                "raw_response": response_text,
-            }
+            **Code Changes (Git Diff), one numbered section per file:**
+            {file_sections}
 
-        except Exception as e:
-            # Fallback if parsing fails
-            return {
-                "overall_summary": response_text[:200] + "...",
-                "file_summaries": [],
-                "technical_details": "",
-                "raw_response": response_text,
-                "parse_error": str(e),
-            }
+            Reply in JSON with file_changes: one entry per file, with its file_number from the
+            "### File N" heading and a description of 1-2 sentences covering what changed and why it
+            matters, plus any important technical concern.
+        """
 
-    def _parse_file_changes(self, file_section: str) -> List[Dict]:
-        """Parse file changes from the response"""
-        file_summaries = []
-        lines = file_section.split("\n")
-
-        for line in lines:
-            line = line.strip()
-            if line.startswith("- ") and ":" in line:
-                # Format: - filename: description
-                parts = line[2:].split(":", 1)
-                if len(parts) == 2:
-                    filename = parts[0].strip()
-                    description = parts[1].strip()
-                    file_summaries.append(
-                        {"filename": filename, "description": description}
-                    )
+    def _create_merge_prompt(
+        self, title: str, description: str, file_summaries: List[Tuple[str, str]]
+    ) -> str:
+        """Create a prompt that merges per-file summaries into the full PR summary"""
+        file_lines = "\n".join(f"- {file_path}: {summary}" for file_path, summary in file_summaries)
+        return f"""
+            Please summarize this pull request as a whole from these per-file summaries.
 
-        return file_summaries
+            **PR Title:** {title}
 
-    def format_summary_for_slack(self, summary: Dict) -> str:
-        """Format the summary for Slack display"""
-        if "error" in summary:
-            return f"❌ {summary['error']}"
+            **PR Description:** {description}
 
-        slack_message = f"🔍 **PR Summary**\n\n"
-        slack_message += f"📋 **Overview:** {summary['overall_summary']}\n\n"
+            **Per-File Summaries:**
+            {file_lines}
 
-        if summary["file_summaries"]:
-            slack_message += "📁 **File Changes:**\n"
-            for file_change in summary["file_summaries"]:
-                slack_message += (
-                    f"• `{file_change['filename']}`: {file_change['description']}\n"
-                )
-            slack_message += "\n"
+            Reply in JSON with:
+            - overall_summary: a 1-2 sentence summary of what this PR accomplishes
+            - technical_details: any important technical notes, potential impacts, or concerns across the files
 
-        if summary["technical_details"]:
-            slack_message += f"⚙️ **Technical Notes:** {summary['technical_details']}\n"
+            Keep it clear and concise. Do not invent changes that are not in the per-file summaries.
+        """
+
+    def _create_release_prompt(self, pr_summaries: List[Tuple[str, str]]) -> str:
+        """Create a prompt combining the summaries of several PRs into release notes"""
+        pr_lines = "\n".join(f"- {pr_url}: {summary}" for pr_url, summary in pr_summaries)
+        return f"""
+            Please combine these pull request summaries into a summary of the release they make up.
 
-        return slack_message
+            **Pull Requests:**
+            {pr_lines}
+
+            Reply in JSON with:
+            - overview: a 2-3 sentence summary of what this release changes as a whole
+            - highlights: the most notable changes, one short line each, citing the PR link
+            - risks: breaking changes, migrations or areas that need extra testing, or "None noted"
+
+            Do not invent changes that are not in the summaries above.
+        """
@@ -1,29 +1,131 @@
 import asyncio
-from dataclasses import dataclass
+import hashlib
+import json
+import logging
 import os
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import uuid
 import httpx
 
-from services.openai_service import OpenAIService
-from services.slack_service import SlackService
+from services.llm_scheduler import LLMOverloadedError, Priority
+from services.openai_service import (
+    OPENAI_OUTAGE_ERRORS,
+    CompletionTruncatedError,
+    OpenAIService,
+    ProgressCallback,
+)
+from services.summary_router import (
+    MAP_REDUCE,
+    SMALL,
+    TEMPLATE,
+    SummaryRoute,
+    choose_route,
+    escalate_route,
+    record_route,
+    template_summary,
+)
+from services.slack_service import SlackBatchReply, SlackMessageResult, SlackProgressMessage, SlackService
 from services.cache_service import (
-    del_pr_cache,
+    acquire_summary_lease,
+    get_batch_sent,
+    get_file_summaries,
+    get_github_cache,
     get_pr_cache,
+    get_pr_cache_fields,
+    is_stale,
+    is_summary_lease_held,
+    mark_batch_sent,
+    release_summary_lease,
+    set_file_summaries,
+    set_github_cache,
     set_pr_cache,
+    wait_for_pr_cache,
 )
 
-from utils.server_utils import get_response_text
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.config import (
+    BATCH_COMPARE_MAX_COMMITS,
+    BATCH_MAX_PRS,
+    BATCH_SUMMARY_CONCURRENCY,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    GITHUB_API_BASE_URL,
+    GITHUB_DIFF_CACHE_MAX_BYTES,
+    GITHUB_DIFF_MAX_BYTES,
+    GITHUB_DIFF_MAX_LINE_BYTES,
+    MAP_REDUCE_CHUNK_TOKENS,
+    OPENAI_MODEL,
+    SUMMARY_LEASE_POLL_INTERVAL,
+    SUMMARY_LEASE_TTL,
+    SUMMARY_STREAMING_ENABLED,
+)
+from utils.diff_chunker import DiffChunk, chunk_file_diffs
+from utils.diff_filter import filter_diff, token_budget_for_model
+from utils.http_clients import get_github_client
+from utils.diff_parser import ParsedDiff, read_diff_stream
+from utils.server_utils import file_diff_hash, get_response_text, merged_pr_numbers, split_diff_by_file
+from utils.single_flight import SingleFlight
+from utils.summary_schema import PRSummary, render_release_summary
+from utils.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Shared by every PRService in the process so all routes dedupe against each other
+_summary_flights = SingleFlight()
+_refresh_tasks: Set[asyncio.Task] = set()
 
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
 
+def _is_github_failure(error: Exception) -> bool:
+    # Outages and throttling count against GitHub; 404s and auth errors are about the request
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return isinstance(error, httpx.TransportError)
 
-@dataclass
-class SlackMessageResult:
-    status: str  # "success" or "error"
-    message: str
-    timestamp: Optional[str] = None
-    channel: Optional[str] = None
+
+github_breaker = CircuitBreaker(
+    "GitHub", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, is_failure=_is_github_failure
+)
+
+# Failures reported to the user without a stack trace in the logs
+EXPECTED_SUMMARY_ERRORS = (
+    KeyError,
+    httpx.HTTPStatusError,
+    CircuitOpenError,
+    LLMOverloadedError,
+    httpx.TimeoutException,
+    TimeoutError,
+    *OPENAI_OUTAGE_ERRORS,
+)
+
+
+# Failures worth retrying from the job queue before telling the user
+TRANSIENT_SUMMARY_ERRORS = (
+    httpx.TransportError,
+    TimeoutError,
+    CircuitOpenError,
+    LLMOverloadedError,
+    *OPENAI_OUTAGE_ERRORS,
+)
+
+
+def _summary_error_text(error: Exception) -> str:
+    """The Slack reply for a summary that failed with error"""
+    if isinstance(error, KeyError):
+        return f"❌ Missing data in response: {str(error)}"
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"❌ GitHub API error: {error.response.status_code}"
+    if isinstance(error, CircuitOpenError):
+        return f"⚠️ {error.name} is having trouble right now. Please try again in {error.retry_after:.0f}s."
+    if isinstance(error, LLMOverloadedError):
+        return "⏳ The summarizer is at capacity right now. Please try again in a minute."
+    if isinstance(error, OPENAI_OUTAGE_ERRORS):
+        return "⚠️ OpenAI is having trouble right now. Please try again in a minute."
+    if isinstance(error, (httpx.TimeoutException, TimeoutError)):
+        return "❌ Request timed out. The PR might be too large."
+    return f"❌ Error analyzing PR: {str(error)}"
+
+
+STALE_NOTE = "⚠️ _Showing a cached summary that may be out of date; a refresh is on its way._\n\n"
 
 
 class PRService:
@@ -31,103 +133,236 @@ class PRService:
         self.github_token = os.getenv("GITHUB_TOKEN")
         self.openai_service = OpenAIService()
         self.slack_service = SlackService()
-        self.client = WebClient(token=os.getenv("BOT_USER_OAUTH_TOKEN"))
 
     # Handle sending messages to a slack channel
     async def send_msg_to_slack_channel(
         self, slack_message: str, channel: str, max_retries: int = 3
     ) -> SlackMessageResult:
-        for attempt in range(1, max_retries + 1):
-            try:
-                # Send to slack
-                result = self.client.chat_postMessage(channel=channel, text=slack_message)
-
-                if result.get("ok"):
-                    ts = result.get("ts", "No timestamp")
-                    ch = result.get("channel", "No channel")
-                    print(f"✅ Slack message sent successfully: {ts}")
-                    return SlackMessageResult(
-                        status="success",
-                        message="Slack message sent successfully",
-                        timestamp=ts,
-                        channel=ch,
-                    )
-                else:
-                    error = result.get("error", "Unknown error")
-                    print(f"⚠️ Slack API error response: {error}")
-                    return SlackMessageResult(
-                        status="error",
-                        message=f"Slack API error: {error}",
-                    )
-
-            except SlackApiError as e:
-                status_code = e.response.status_code
-                error_detail = e.response.get("error", "Unknown Slack API error")
-                print(f"❌ Slack API error: {error_detail} (status: {status_code})")
-
-                if status_code == 429 and attempt < max_retries:
-                    retry_after = int(e.response.headers.get("Retry-After", "1"))
-                    print(f"⏳ Rate limited. Retrying after {retry_after} seconds...")
-                    await asyncio.sleep(retry_after)
-                    continue  # retry
-
-                return SlackMessageResult(
-                    status="error",
-                    message=f"Slack API error: {error_detail}",
-                )
-
-            except Exception as e:
-                print("❌ Unexpected error sending Slack message")
-                return SlackMessageResult(
-                    status="error",
-                    message="Unexpected error sending Slack message",
-                )
-
-        # Fallback in case all retries fail
-        return SlackMessageResult(
-            status="error",
-            message="Failed to send Slack message after retries",
-        )
+        return await self.slack_service.post_message(slack_message, channel, max_retries)
 
     # Background task to process PR and send result back to Slack
-    async def process_pr_summary(self, pr_url: str, response_url: str) -> None:
+    async def process_pr_summary(
+        self,
+        pr_url: str,
+        response_url: str,
+        priority: Priority = Priority.INTERACTIVE,
+        channel_id: Optional[str] = None,
+        raise_transient: bool = False,
+    ) -> None:
+        """
+        Summarize pr_url and reply in Slack. With raise_transient (job retries left), transient
+        failures are raised for the job queue to retry instead of being reported.
+        """
+        # Edited in place as the summary streams in, then replaced by the final text
+        reply = SlackProgressMessage(self.slack_service, response_url, channel_id)
+        on_progress = reply.update if SUMMARY_STREAMING_ENABLED else None
         try:
-            cached_summary = await get_pr_cache(pr_url=pr_url)
+            with span("cache_lookup"):
+                cached_summary = await get_pr_cache(pr_url=pr_url)
             response_text = ""
 
             # Send the response text back to slack using the response url
             if cached_summary:
                 response_text = get_response_text(cached_summary)
+                if is_stale(cached_summary):
+                    # Serve last-known-good right away and recompute behind it
+                    response_text = STALE_NOTE + response_text
+                    self._refresh_in_background(pr_url)
             else:
-                (pr_data, diff_content) = await self.fetch_pr(pr_url)
-                response_text = await self.summarize_pr(pr_url, pr_data, diff_content)
+                # Concurrent requests for the same PR share one computation
+                response_text = await _summary_flights.do(
+                    pr_url, lambda: self._compute_pr_summary(pr_url, priority, on_progress)
+                )
 
-            await self.slack_service.send_to_slack_response_url(response_url, response_text)
+            await reply.finish(response_text)
 
-        except KeyError as key_error:
-            error_msg = f"❌ Missing data in response: {str(key_error)}"
-            print(f"KeyError in process_pr_summary: {key_error}")
-            await self.slack_service.send_to_slack_response_url(response_url, error_msg)
-            await del_pr_cache(pr_url)
+        except Exception as e:
+            if raise_transient and isinstance(e, TRANSIENT_SUMMARY_ERRORS):
+                if reply.started:
+                    await reply.finish("⏳ Hit a temporary problem; retrying shortly...")
+                raise
+            log = logger.warning if isinstance(e, EXPECTED_SUMMARY_ERRORS) else logger.exception
+            log(f"Failed to summarize {pr_url}: {e!r}")
+            await reply.finish(_summary_error_text(e))
+
+    async def process_pr_batch(
+        self,
+        pr_urls: List[str],
+        response_url: str,
+        channel_id: Optional[str] = None,
+        compare_url: Optional[str] = None,
+        release_summary: bool = False,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> None:
+        """
+        Summarize several PRs for one slash command, plus every PR merged in compare_url. Cached
+        summaries are sent at once; misses are computed BATCH_SUMMARY_CONCURRENCY at a time and
+        sent as each completes, followed by a combined release summary if asked for.
+        """
+        reply = SlackBatchReply(self.slack_service, response_url, channel_id)
+        # A retried or reclaimed job resumes: parts already delivered are not posted again
+        batch_id = hashlib.sha256(response_url.encode("utf-8")).hexdigest()[:16]
+        sent = await get_batch_sent(batch_id)
+        if "status" in sent:
+            return
+        undelivered: List[str] = []
+
+        async def deliver(part: str, text: str) -> None:
+            if await reply.send(text):
+                await mark_batch_sent(batch_id, [part])
+            else:
+                undelivered.append(part)
 
-        except httpx.HTTPStatusError as http_error:
-            error_msg = f"❌ GitHub API error: {http_error.response.status_code}"
-            print(f"HTTP error: {http_error}")
-            await self.slack_service.send_to_slack_response_url(response_url, error_msg)
-            await del_pr_cache(pr_url)
+        notes = []
+        if compare_url:
+            try:
+                compare_pr_urls, complete = await self.fetch_compare_pr_urls(compare_url)
+            except Exception as e:
+                logger.warning(f"Failed to list PRs in {compare_url}: {e!r}")
+                await reply.finish(_summary_error_text(e))
+                return
+            pr_urls = list(dict.fromkeys(pr_urls + compare_pr_urls))
+            if not complete:
+                notes.append(f"Only the first {BATCH_COMPARE_MAX_COMMITS} commits of the range were read.")
+
+        if not pr_urls:
+            await reply.finish(f"No merged PRs found in {compare_url}.")
+            return
+        if len(pr_urls) > BATCH_MAX_PRS:
+            notes.append(f"Skipped {len(pr_urls) - BATCH_MAX_PRS} more over the limit of {BATCH_MAX_PRS}.")
+            pr_urls = pr_urls[:BATCH_MAX_PRS]
+        to_send = [pr_url for pr_url in pr_urls if pr_url not in sent]
+
+        with span("cache_lookup", prs=len(to_send)):
+            cached_summaries = await asyncio.gather(*(get_pr_cache(pr_url=pr_url) for pr_url in to_send))
+
+        misses = []
+        for pr_url, cached_summary in zip(to_send, cached_summaries):
+            if not cached_summary:
+                misses.append(pr_url)
+                continue
+            response_text = get_response_text(cached_summary)
+            if is_stale(cached_summary):
+                response_text = STALE_NOTE + response_text
+                self._refresh_in_background(pr_url)
+            await deliver(pr_url, response_text)
+
+        # Bounded so one release review cannot take every GitHub connection and LLM slot
+        semaphore = asyncio.Semaphore(BATCH_SUMMARY_CONCURRENCY)
+        failed: List[str] = []
+
+        async def summarize(pr_url: str) -> Tuple[str, str]:
+            async with semaphore:
+                try:
+                    return pr_url, await _summary_flights.do(
+                        pr_url, lambda: self._compute_pr_summary(pr_url, priority)
+                    )
+                except Exception as e:
+                    log = logger.warning if isinstance(e, EXPECTED_SUMMARY_ERRORS) else logger.exception
+                    log(f"Failed to summarize {pr_url} in batch: {e!r}")
+                    failed.append(pr_url)
+                    return pr_url, f"🔗 {pr_url}\n{_summary_error_text(e)}"
 
-        except httpx.TimeoutException:
-            error_msg = "❌ Request timed out. The PR might be too large."
-            print("Timeout error in process_pr_summary")
-            await self.slack_service.send_to_slack_response_url(response_url, error_msg)
+        for next_done in asyncio.as_completed([summarize(pr_url) for pr_url in misses]):
+            await deliver(*(await next_done))
 
+        if release_summary and "release" not in sent:
+            await deliver("release", await self._release_summary_text(pr_urls, failed, priority))
+
+        status = (
+            f"✅ Summarized {len(pr_urls) - len(failed)} of {len(pr_urls)} PRs "
+            f"({len(to_send) - len(misses)} from cache)."
+        )
+        await reply.finish(" ".join([status] + notes))
+        await mark_batch_sent(batch_id, undelivered + ["status"])
+
+    async def _release_summary_text(self, pr_urls: List[str], failed: List[str], priority: Priority) -> str:
+        pr_summaries = []
+        for pr_url in pr_urls:
+            if pr_url in failed:
+                continue
+            cached = await get_pr_cache_fields(pr_url, ["overall_summary", "summary"])
+            summary = cached.get("overall_summary") or cached.get("summary")
+            if summary:
+                pr_summaries.append((pr_url, summary))
+        if not pr_summaries:
+            return "❌ No PR summaries available for a release summary."
+
+        try:
+            release = await self.openai_service.summarize_release(pr_summaries, priority=priority)
         except Exception as e:
-            error_msg = f"❌ Error analyzing PR: {str(e)}"
-            print(f"Unexpected error in process_pr_summary: {e}")
-            await self.slack_service.send_to_slack_response_url(response_url, error_msg)
-            await del_pr_cache(pr_url)
+            logger.warning(f"Failed to build release summary: {e!r}")
+            return f"❌ Release summary failed: {_summary_error_text(e)}"
+        return render_release_summary(release, len(pr_summaries))
 
-    async def fetch_pr(self, pr_url: str) -> Tuple[Dict[str, Any], str]:
+    # Recompute a stale summary without holding up the reply; failures keep the stale entry
+    def _refresh_in_background(self, pr_url: str) -> None:
+        if _summary_flights.is_running(pr_url):
+            return
+
+        async def refresh() -> None:
+            try:
+                await _summary_flights.do(
+                    pr_url, lambda: self._compute_pr_summary(pr_url, Priority.BACKGROUND)
+                )
+            except Exception as e:
+                logger.warning(f"Background refresh of {pr_url} failed, keeping stale summary: {e}")
+
+        task = asyncio.create_task(refresh())
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+
+    # Webhook-triggered: fill the cache ahead of the first /summarizepr, at pre-warm priority
+    async def prewarm_pr_summary(self, pr_url: str, head_sha: str) -> None:
+        cached = await get_pr_cache_fields(pr_url, ["head_sha", "fresh_until"])
+        if cached.get("head_sha") == head_sha and not is_stale(cached):
+            logger.info(f"Summary for {pr_url} already cached at {head_sha[:7]}")
+            return
+        if _summary_flights.is_running(pr_url) or await is_summary_lease_held(pr_url):
+            logger.info(f"Summary for {pr_url} already being computed; skipping pre-warm")
+            return
+
+        # Its own flight key and no lease: a /summarizepr arriving meanwhile computes at its own
+        # priority rather than joining (or waiting on) this low-priority computation
+        await _summary_flights.do(
+            f"prewarm:{pr_url}", lambda: self._fetch_and_summarize(pr_url, Priority.PREWARM)
+        )
+        logger.info(f"Pre-warmed summary for {pr_url}")
+
+    # Fetch and summarize a PR, unless another worker holding the lease caches it first
+    async def _compute_pr_summary(
+        self,
+        pr_url: str,
+        priority: Priority = Priority.INTERACTIVE,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> str:
+        lease_token = uuid.uuid4().hex
+        if await acquire_summary_lease(pr_url, lease_token, ttl=SUMMARY_LEASE_TTL):
+            try:
+                return await self._fetch_and_summarize(pr_url, priority, on_progress)
+            finally:
+                await release_summary_lease(pr_url, lease_token)
+
+        cached_summary = await wait_for_pr_cache(
+            pr_url, timeout=SUMMARY_LEASE_TTL, interval=SUMMARY_LEASE_POLL_INTERVAL
+        )
+        if cached_summary:
+            return get_response_text(cached_summary)
+
+        # Lease holder failed or expired without caching; compute it ourselves
+        return await self._fetch_and_summarize(pr_url, priority, on_progress)
+
+    async def _fetch_and_summarize(
+        self,
+        pr_url: str,
+        priority: Priority = Priority.INTERACTIVE,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> str:
+        with span("fetch_pr"):
+            (pr_data, parsed_diff) = await self.fetch_pr(pr_url)
+        return await self.summarize_pr(pr_url, pr_data, parsed_diff, priority, on_progress)
+
+    async def fetch_pr(self, pr_url: str) -> Tuple[Dict[str, Any], ParsedDiff]:
         parts = pr_url.split("/")
 
         try:
@@ -141,21 +376,121 @@ class PRService:
         else:
             raise ValueError("GitHub token not provided.")
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Fetch PR data
-            github_api_url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}"
-            pr_resp = await client.get(github_api_url, headers=headers)
-            pr_data = pr_resp.json()
+        client = get_github_client()
+        github_api_url = f"{GITHUB_API_BASE_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
+
+        # Fetch PR data and diff in parallel, revalidating any responses cached from earlier fetches
+        github_cache = await get_github_cache(pr_url)
+        (pr_data, pr_updates), (parsed_diff, diff_updates) = await github_breaker.call(
+            lambda: asyncio.gather(
+                self._fetch_pr_data(client, github_api_url, headers, github_cache),
+                self._fetch_pr_diff(client, github_api_url, headers, github_cache),
+            )
+        )
+        if pr_updates or diff_updates:
+            await set_github_cache(pr_url, {**pr_updates, **diff_updates})
 
-            # Fetch PR diff content
-            diff_headers = headers.copy()
-            diff_headers["Accept"] = "application/vnd.github.v3.diff"
-            diff_resp = await client.get(github_api_url, headers=diff_headers)
-            diff_content = diff_resp.text
+        if parsed_diff.truncated:
+            logger.warning(f"Diff for {pr_url} cut off after {parsed_diff.num_bytes} bytes")
 
-        return (pr_data, diff_content)
+        return (pr_data, parsed_diff)
 
-    async def summarize_pr(self, pr_url: str, pr_data: Dict[str, Any], diff_content: str) -> str:
+    async def fetch_compare_pr_urls(self, compare_url: str) -> Tuple[List[str], bool]:
+        """
+        Links to the PRs merged between the two refs of a GitHub compare URL, oldest first, and
+        whether the whole range was read (it stops after BATCH_COMPARE_MAX_COMMITS commits)
+        """
+        parts = compare_url.split("/")
+        try:
+            owner, repo, basehead = parts[3], parts[4], "/".join(parts[6:])
+        except IndexError:
+            raise ValueError(f"Invalid compare URL: {compare_url}")
+        if not self.github_token:
+            raise ValueError("GitHub token not provided.")
+
+        client = get_github_client()
+        headers = {"Authorization": f"token {self.github_token}"}
+        github_api_url = f"{GITHUB_API_BASE_URL}/repos/{owner}/{repo}/compare/{basehead}"
+        messages: List[str] = []
+        total_commits = 0
+        page = 1
+        # Unpaginated, the compare API stops at 250 commits; page through the rest
+        with span("fetch_compare"):
+            while len(messages) < BATCH_COMPARE_MAX_COMMITS:
+                params = {"per_page": 100, "page": page}
+                resp = await github_breaker.call(
+                    lambda: client.get(github_api_url, headers=headers, params=params)
+                )
+                resp.raise_for_status()
+                body = resp.json()
+                commits = body.get("commits", [])
+                messages.extend(commit["commit"]["message"] for commit in commits)
+                total_commits = body.get("total_commits", len(messages))
+                if not commits or len(messages) >= total_commits:
+                    break
+                page += 1
+
+        complete = len(messages) >= total_commits and len(messages) <= BATCH_COMPARE_MAX_COMMITS
+        numbers = merged_pr_numbers(messages[:BATCH_COMPARE_MAX_COMMITS])
+        return [f"https://github.com/{owner}/{repo}/pull/{number}" for number in numbers], complete
+
+    async def _fetch_pr_data(
+        self, client: httpx.AsyncClient, url: str, headers: Dict[str, str], github_cache: Dict[str, str]
+    ) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        request_headers = headers.copy()
+        if github_cache.get("pr_json"):
+            request_headers.update(_conditional_headers(github_cache, "pr"))
+
+        pr_resp = await client.get(url, headers=request_headers)
+        if pr_resp.status_code == 304:
+            logger.debug(f"PR data not modified: {url}")
+            return (json.loads(github_cache["pr_json"]), {})
+
+        pr_data = pr_resp.json()
+        updates = {}
+        if pr_resp.status_code == 200:
+            updates = _validator_fields(pr_resp, "pr")
+            if updates:
+                updates["pr_json"] = pr_resp.text
+        return (pr_data, updates)
+
+    # Stream the PR diff and parse it file by file, stopping at GITHUB_DIFF_MAX_BYTES
+    async def _fetch_pr_diff(
+        self, client: httpx.AsyncClient, url: str, headers: Dict[str, str], github_cache: Dict[str, str]
+    ) -> Tuple[ParsedDiff, Dict[str, str]]:
+        diff_headers = headers.copy()
+        diff_headers["Accept"] = "application/vnd.github.v3.diff"
+        if github_cache.get("diff"):
+            diff_headers.update(_conditional_headers(github_cache, "diff"))
+
+        async with client.stream("GET", url, headers=diff_headers) as diff_resp:
+            if diff_resp.status_code == 304:
+                logger.debug(f"PR diff not modified: {url}")
+                diff_content = github_cache["diff"]
+                return (ParsedDiff(split_diff_by_file(diff_content), len(diff_content), False), {})
+
+            diff_resp.raise_for_status()
+            parsed_diff = await read_diff_stream(
+                diff_resp, max_bytes=GITHUB_DIFF_MAX_BYTES, max_line_bytes=GITHUB_DIFF_MAX_LINE_BYTES
+            )
+            updates = _validator_fields(diff_resp, "diff")
+
+        # Only complete, reasonably small diffs are worth keeping for revalidation
+        if updates and not parsed_diff.truncated:
+            diff_content = "\n".join(file_diff for _, file_diff in parsed_diff.files)
+            if len(diff_content) <= GITHUB_DIFF_CACHE_MAX_BYTES:
+                updates["diff"] = diff_content
+                return (parsed_diff, updates)
+        return (parsed_diff, {})
+
+    async def summarize_pr(
+        self,
+        pr_url: str,
+        pr_data: Dict[str, Any],
+        parsed_diff: ParsedDiff,
+        priority: Priority = Priority.INTERACTIVE,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> str:
         # Extract relevant info
         title = pr_data["title"] or "No title provided"
         description = pr_data["body"] or "No description provided"
@@ -165,11 +500,7 @@ class PRService:
         files_changed = pr_data.get("changed_files", 0)  # Files changed count
         additions = pr_data.get("additions", 0)
         deletions = pr_data.get("deletions", 0)
-
-        # print_pr_info(title, description, files_changed, additions, deletions, diff_content)
-
-        # Use OpenAI to summarize the PR
-        summary = self.openai_service.summarize_pr(title, description, diff_content)
+        head = pr_data.get("head") or {}
 
         response_dict = {
             "author": author,
@@ -178,12 +509,188 @@ class PRService:
             "deletions": deletions,
             "html_url": html_url,
             "state": state,
-            "summary": summary,
+            # Tags used to invalidate the entry when the PR's head moves
+            "head_sha": head.get("sha") or "",
+            "head_ref": head.get("ref") or "",
+            "repo_full_name": (head.get("repo") or {}).get("full_name") or "",
         }
 
+        # Partial summaries are shown under the PR details as they stream in
+        def render_progress(partial: Callable[[], str]) -> None:
+            def render() -> str:
+                text = partial()
+                return get_response_text({**response_dict, "summary": text + " ▍"}) if text else ""
+
+            on_progress(render)
+
+        # Drop diff noise and fit the rest to the model's token budget before any LLM call
+        with span("prompt_build"):
+            file_diffs, filter_report = filter_diff(
+                parsed_diff.files, token_budget_for_model(OPENAI_MODEL)
+            )
+        filter_report.diff_truncated = parsed_diff.truncated
+        logger.debug(
+            f"Diff filtered from ~{filter_report.tokens_before} to ~{filter_report.tokens_after} tokens"
+        )
+
+        # Trivial PRs skip the LLM, small ones get the small model, only large ones go through
+        # map-reduce with cached per-file summaries
+        route = choose_route(files_changed, additions, deletions, file_diffs, filter_report)
+        if route.name == TEMPLATE:
+            summary = template_summary(title, file_diffs, additions, deletions)
+        elif route.name == MAP_REDUCE:
+            summary = await self._summarize_by_file(
+                title, description, file_diffs, priority, render_progress if on_progress else None
+            )
+        else:
+            filtered_diff = "\n".join(file_diff for _, file_diff in file_diffs)
+            progress = render_progress if on_progress else None
+            try:
+                summary = await self._summarize_single(
+                    title, description, filtered_diff, route, priority, progress
+                )
+            except CompletionTruncatedError:
+                if route.name != SMALL:
+                    raise
+                # The small route's tight token limit cut the JSON short; redo it with the standard budget
+                route = escalate_route(route)
+                summary = await self._summarize_single(
+                    title, description, filtered_diff, route, priority, progress
+                )
+
+        if not isinstance(summary, PRSummary):
+            # Never overwrite a last-known-good summary with an error
+            raise RuntimeError(summary.get("error", "Summary generation failed"))
+
+        # Stored as separate fields (see SUMMARY_FIELDS) and rendered on read
+        response_dict.update(summary.model_dump())
+        response_dict["notes"] = filter_report.describe()
+        response_dict["route"] = route.name
+        record_route(route)
+
         # Set data in the cache
-        await set_pr_cache(pr_url=pr_url, pr_dict=response_dict)
+        with span("cache_write"):
+            await set_pr_cache(pr_url=pr_url, pr_dict=response_dict)
 
         # Return the AI-generated summary
         response_text = get_response_text(response_dict=response_dict)
         return response_text
+
+    async def _summarize_single(
+        self,
+        title: str,
+        description: str,
+        diff_content: str,
+        route: SummaryRoute,
+        priority: Priority,
+        on_progress: Optional[ProgressCallback],
+    ) -> PRSummary | Dict:
+        return await self.openai_service.summarize_pr(
+            title,
+            description,
+            diff_content,
+            priority=priority,
+            on_progress=on_progress,
+            model=route.model,
+            max_tokens=route.max_tokens,
+        )
+
+    # Map-reduce: summarize token-budgeted chunks of the files whose hunks changed since they
+    # were last seen, concurrently, then merge every file's summary into the final format
+    async def _summarize_by_file(
+        self,
+        title: str,
+        description: str,
+        file_diffs: List[Tuple[str, str]],
+        priority: Priority = Priority.INTERACTIVE,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> PRSummary:
+        content_hashes = [file_diff_hash(file_path, file_diff) for file_path, file_diff in file_diffs]
+        file_summaries = await get_file_summaries(content_hashes)
+
+        misses = [
+            (content_hash, file_path, file_diff)
+            for content_hash, (file_path, file_diff) in zip(content_hashes, file_diffs)
+            if content_hash not in file_summaries
+        ]
+        chunks = chunk_file_diffs(
+            [(file_path, file_diff) for _, file_path, file_diff in misses], MAP_REDUCE_CHUNK_TOKENS
+        )
+        logger.debug(f"Summarizing {len(misses)} of {len(file_diffs)} files in {len(chunks)} chunk(s)")
+
+        completed = 0
+
+        async def summarize_chunk(chunk: DiffChunk) -> Dict[int, str]:
+            nonlocal completed
+            result = await self.openai_service.summarize_chunk(title, chunk, priority=priority)
+            # Files the model skipped get one retry on their own, where nothing needs matching
+            missing = [position for position in range(len(chunk.file_paths)) if position not in result]
+            if len(chunk.file_paths) > 1 and missing:
+                retries = await asyncio.gather(
+                    *(
+                        self.openai_service.summarize_chunk(
+                            title,
+                            DiffChunk([chunk.file_paths[position]], [chunk.parts[position]]),
+                            priority=priority,
+                        )
+                        for position in missing
+                    )
+                )
+                for position, retry in zip(missing, retries):
+                    if 0 in retry:
+                        result[position] = retry[0]
+            completed += 1
+            if on_progress:
+                on_progress(lambda: f"_Summarized {completed} of {len(chunks)} part(s) of the diff..._")
+            return result
+
+        chunk_results = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+
+        # Files split across chunks get one partial summary per part, in order
+        part_counts: Dict[str, int] = {}
+        partials: Dict[str, List[str]] = {}
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            for position, file_path in enumerate(chunk.file_paths):
+                part_counts[file_path] = part_counts.get(file_path, 0) + 1
+                if position in chunk_result:
+                    partials.setdefault(file_path, []).append(chunk_result[position])
+
+        fresh = {}
+        for content_hash, file_path, _ in misses:
+            if file_path not in partials:
+                continue
+            file_summaries[content_hash] = " ".join(partials[file_path])
+            # A split file is only cached once every part has been summarized
+            if len(partials[file_path]) == part_counts[file_path]:
+                fresh[content_hash] = file_summaries[content_hash]
+        if fresh:
+            await set_file_summaries(fresh)
+
+        return await self.openai_service.merge_file_summaries(
+            title,
+            description,
+            [
+                (file_path, file_summaries.get(h, "Changes could not be summarized"))
+                for h, (file_path, _) in zip(content_hashes, file_diffs)
+            ],
+            priority=priority,
+            on_progress=on_progress,
+        )
+
+
+def _conditional_headers(github_cache: Dict[str, str], prefix: str) -> Dict[str, str]:
+    headers = {}
+    if github_cache.get(f"{prefix}_etag"):
+        headers["If-None-Match"] = github_cache[f"{prefix}_etag"]
+    if github_cache.get(f"{prefix}_last_modified"):
+        headers["If-Modified-Since"] = github_cache[f"{prefix}_last_modified"]
+    return headers
+
+
+def _validator_fields(response: httpx.Response, prefix: str) -> Dict[str, str]:
+    fields = {}
+    if response.headers.get("ETag"):
+        fields[f"{prefix}_etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        fields[f"{prefix}_last_modified"] = response.headers["Last-Modified"]
+    return fields
@@ -1,15 +1,392 @@
-import httpx
+import asyncio
+from dataclasses import dataclass
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from slack_sdk.web.async_client import AsyncWebClient
+from slack_sdk.errors import SlackApiError
+
+from utils.config import (
+    SLACK_CHANNEL_BURST,
+    SLACK_CHANNEL_RATE,
+    SLACK_DIGEST_MAX_ITEMS,
+    SLACK_DIGEST_WINDOW,
+    SLACK_MESSAGE_MAX_CHARS,
+    SLACK_QUEUE_DRAIN_TIMEOUT,
+    SLACK_QUEUE_MAXSIZE,
+    SLACK_RESPONSE_URL_MAX_USES,
+    SLACK_STREAM_UPDATE_INTERVAL,
+)
+from utils.http_clients import get_slack_client, get_slack_web_client
+from utils.rate_limiter import TokenBucket
+from utils.telemetry import RATE_LIMITED, RETRIES, SLACK_EVENTS_COALESCED, span
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SlackMessageResult:
+    status: str  # "success" or "error"
+    message: str
+    timestamp: Optional[str] = None
+    channel: Optional[str] = None
+
+
+# One bucket per channel, shared by every SlackService in the process (Slack allows ~1 msg/sec/channel).
+_channel_limiters: Dict[str, TokenBucket] = {}
+
+
+def _get_channel_limiter(channel: str) -> TokenBucket:
+    limiter = _channel_limiters.get(channel)
+    if limiter is None:
+        limiter = TokenBucket(rate=SLACK_CHANNEL_RATE, capacity=SLACK_CHANNEL_BURST)
+        _channel_limiters[channel] = limiter
+    return limiter
 
 
 class SlackService:
-    async def send_to_slack_response_url(self, response_url: str, response_text: str):
+    @property
+    def client(self) -> AsyncWebClient:
+        # Every SlackService shares the process's client and its pooled connections
+        return get_slack_web_client()
+
+    async def send_to_slack_response_url(
+        self, response_url: str, response_text: str, replace_original: bool = False
+    ):
         # Send delayed response back to slack
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                payload = {
-                    "text": response_text,
-                    "response_type": "in_channel",  # or "ephemeral" for private
-                }
-                await client.post(response_url, json=payload)
+            payload = {
+                "text": response_text,
+                "response_type": "in_channel",  # or "ephemeral" for private
+            }
+            if replace_original:
+                payload["replace_original"] = True
+            with span("slack_delivery", method="response_url"):
+                await get_slack_client().post(response_url, json=payload)
         except Exception as e:
-            print(f"Failed to send response to Slack: {e}")
+            logger.warning(f"Failed to send response to Slack: {e}")
+
+    # Edit a message the bot posted earlier
+    async def update_message(self, channel: str, ts: str, slack_message: str) -> SlackMessageResult:
+        try:
+            with span("slack_delivery", method="chat.update"):
+                result = await self.client.chat_update(channel=channel, ts=ts, text=slack_message)
+            if result.get("ok"):
+                return SlackMessageResult(
+                    status="success", message="Slack message updated", timestamp=ts, channel=channel
+                )
+            return SlackMessageResult(
+                status="error", message=f"Slack API error: {result.get('error', 'Unknown error')}"
+            )
+        except SlackApiError as e:
+            error_detail = e.response.get("error", "Unknown Slack API error")
+            logger.error(f"❌ Slack API error updating message: {error_detail}")
+            return SlackMessageResult(status="error", message=f"Slack API error: {error_detail}")
+        except Exception as e:
+            logger.exception(f"❌ Unexpected error updating Slack message: {e}")
+            return SlackMessageResult(status="error", message="Unexpected error updating Slack message")
+
+    # Post a message to a channel, paced by the channel's token bucket
+    async def post_message(
+        self, slack_message: str, channel: str, max_retries: int = 3
+    ) -> SlackMessageResult:
+        limiter = _get_channel_limiter(channel)
+
+        for attempt in range(1, max_retries + 1):
+            await limiter.acquire()
+            try:
+                with span("slack_delivery", method="chat.postMessage"):
+                    result = await self.client.chat_postMessage(channel=channel, text=slack_message)
+
+                if result.get("ok"):
+                    ts = result.get("ts", "No timestamp")
+                    ch = result.get("channel", "No channel")
+                    logger.debug(f"✅ Slack message sent successfully: {ts}")
+                    return SlackMessageResult(
+                        status="success",
+                        message="Slack message sent successfully",
+                        timestamp=ts,
+                        channel=ch,
+                    )
+                else:
+                    error = result.get("error", "Unknown error")
+                    logger.warning(f"⚠️ Slack API error response: {error}")
+                    return SlackMessageResult(
+                        status="error",
+                        message=f"Slack API error: {error}",
+                    )
+
+            except SlackApiError as e:
+                status_code = e.response.status_code
+                error_detail = e.response.get("error", "Unknown Slack API error")
+                logger.error(f"❌ Slack API error: {error_detail} (status: {status_code})")
+
+                if status_code == 429:
+                    RATE_LIMITED.labels("slack").inc()
+                if status_code == 429 and attempt < max_retries:
+                    retry_after = int(e.response.headers.get("Retry-After", "1"))
+                    logger.warning(f"⏳ Rate limited. Pausing channel {channel} for {retry_after} seconds...")
+                    limiter.pause(retry_after)
+                    RETRIES.labels("slack").inc()
+                    continue  # retry
+
+                return SlackMessageResult(
+                    status="error",
+                    message=f"Slack API error: {error_detail}",
+                )
+
+            except Exception as e:
+                logger.exception(f"❌ Unexpected error sending Slack message: {e}")
+                return SlackMessageResult(
+                    status="error",
+                    message="Unexpected error sending Slack message",
+                )
+
+        # Fallback in case all retries fail
+        return SlackMessageResult(
+            status="error",
+            message="Failed to send Slack message after retries",
+        )
+
+
+class SlackProgressMessage:
+    """
+    A slash command reply that is edited in place while a summary is generated. It posts to the
+    channel and edits with chat.update when the bot can. Otherwise it falls back to response_url
+    replace_original, which Slack allows SLACK_RESPONSE_URL_MAX_USES times, so one use is kept for
+    the final text. Edits are throttled and coalesced, and the newest text wins.
+    """
+
+    def __init__(self, slack_service: SlackService, response_url: str, channel_id: Optional[str] = None):
+        self.slack_service = slack_service
+        self.response_url = response_url
+        self.channel_id = channel_id
+        self._channel: Optional[str] = None
+        self._ts: Optional[str] = None  # Set once posted via chat.postMessage
+        self._response_url_uses = 0
+        self._last_sent = 0.0
+        self._sending: Optional[asyncio.Task] = None
+
+    @property
+    def started(self) -> bool:
+        return self._ts is not None or self._response_url_uses > 0
+
+    def update(self, render: Callable[[], str]) -> None:
+        """
+        Show progress without blocking the caller; skipped if too soon or an edit is in flight.
+        The text is only rendered once an edit will be sent, and nothing is sent if it is empty.
+        """
+        if self._sending and not self._sending.done():
+            return
+        if time.monotonic() - self._last_sent < SLACK_STREAM_UPDATE_INTERVAL:
+            return
+        if self._ts is None and self._response_url_uses >= SLACK_RESPONSE_URL_MAX_USES - 1:
+            return
+        text = render()
+        if not text:
+            return
+        self._last_sent = time.monotonic()
+        self._sending = asyncio.create_task(self._send(text))
+
+    async def finish(self, text: str) -> None:
+        if self._sending:
+            await self._sending
+        if not self.started:
+            # Nothing streamed (cache hit or error): a plain slash command reply
+            await self.slack_service.send_to_slack_response_url(self.response_url, text)
+            return
+        await self._send(text)
+
+    async def _send(self, text: str) -> None:
+        if not self.started and self.channel_id:
+            result = await self.slack_service.post_message(text, self.channel_id)
+            if result.status == "success":
+                self._channel, self._ts = result.channel, result.timestamp
+                return
+            self.channel_id = None  # e.g. the bot is not in the channel
+
+        if self._ts:
+            result = await self.slack_service.update_message(self._channel, self._ts, text)
+            if result.status == "error":
+                logger.warning(f"Failed to update progress message: {result.message}")
+            return
+
+        await self.slack_service.send_to_slack_response_url(
+            self.response_url, text, replace_original=self._response_url_uses > 0
+        )
+        self._response_url_uses += 1
+
+
+class SlackBatchReply:
+    """
+    Several messages answering one slash command, such as a batch of PR summaries. Each is posted
+    to the channel as soon as it is ready when the bot can. Otherwise they are buffered and sent
+    through response_url at the end, packed into at most SLACK_RESPONSE_URL_MAX_USES messages.
+    """
+
+    def __init__(self, slack_service: SlackService, response_url: str, channel_id: Optional[str] = None):
+        self.slack_service = slack_service
+        self.response_url = response_url
+        self.channel_id = channel_id
+        self._pending: List[str] = []
+
+    async def send(self, text: str) -> bool:
+        """True once posted; False if buffered until finish()"""
+        if self.channel_id:
+            result = await self.slack_service.post_message(text, self.channel_id)
+            if result.status == "success":
+                return True
+            self.channel_id = None  # e.g. the bot is not in the channel
+        self._pending.append(text)
+        return False
+
+    async def finish(self, text: str) -> None:
+        """Send text, and anything still buffered, through response_url"""
+        messages = pack_messages(self._pending + [text], SLACK_MESSAGE_MAX_CHARS)
+        if len(messages) > SLACK_RESPONSE_URL_MAX_USES:
+            # Over budget: the last allowed message carries the rest and Slack truncates it
+            last = SLACK_RESPONSE_URL_MAX_USES - 1
+            messages = messages[:last] + ["\n\n---\n\n".join(messages[last:])]
+        self._pending = []
+        for message in messages:
+            await self.slack_service.send_to_slack_response_url(self.response_url, message)
+
+
+def pack_messages(texts: List[str], max_chars: int) -> List[str]:
+    """Join texts into as few messages of at most max_chars as keep each text whole"""
+    messages: List[str] = []
+    for text in texts:
+        if messages and len(messages[-1]) + len(text) + 7 <= max_chars:
+            messages[-1] += "\n\n---\n\n" + text
+        else:
+            messages.append(text)
+    return messages
+
+
+# (coalesce key, message text) as queued for a channel
+QueuedMessage = Tuple[Optional[str], str]
+
+
+def build_digests(batch: List[QueuedMessage]) -> List[str]:
+    """
+    Collapse queued messages into as few as possible: messages sharing a coalesce key keep only the
+    latest, and two or more remaining messages are joined into digests of SLACK_DIGEST_MAX_ITEMS.
+    """
+    latest: "OrderedDict[object, Tuple[str, int]]" = OrderedDict()
+    for position, (key, slack_message) in enumerate(batch):
+        slot = key if key is not None else position
+        _, count = latest.get(slot, ("", 0))
+        latest[slot] = (slack_message, count + 1)
+
+    lines = [
+        slack_message + (f" _(+{count - 1} earlier update(s))_" if count > 1 else "")
+        for slack_message, count in latest.values()
+    ]
+    if len(lines) == 1:
+        return lines
+
+    digests = []
+    for start in range(0, len(lines), SLACK_DIGEST_MAX_ITEMS):
+        chunk = lines[start : start + SLACK_DIGEST_MAX_ITEMS]
+        digests.append(f"📬 {len(chunk)} updates:\n" + "\n".join(f"• {line}" for line in chunk))
+    return digests
+
+
+class SlackMessageQueue:
+    """
+    Fire-and-forget channel messages. Each channel gets its own FIFO and sender task,
+    so messages keep their order within a channel while channels drain in parallel.
+    Messages that pile up while the sender waits (plus any within SLACK_DIGEST_WINDOW of the
+    first) go out as one digest, so bursts cost a handful of Slack calls instead of one per event.
+    """
+
+    def __init__(self, slack_service: Optional[SlackService] = None):
+        self.slack_service = slack_service
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._senders: Dict[str, asyncio.Task] = {}
+        self._closed = False
+
+    def enqueue(self, slack_message: str, channel: str, coalesce_key: Optional[str] = None) -> bool:
+        """
+        Queue a message for `channel`. Queued messages with the same `coalesce_key` (e.g. a PR URL)
+        collapse to the latest one. Returns False if the queue is full or shut down.
+        """
+        if self._closed:
+            return False
+        if self.slack_service is None:
+            self.slack_service = SlackService()
+
+        queue = self._queues.get(channel)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=SLACK_QUEUE_MAXSIZE)
+            self._queues[channel] = queue
+            self._senders[channel] = asyncio.create_task(self._run_sender(channel, queue))
+
+        try:
+            queue.put_nowait((coalesce_key, slack_message))
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"⚠️ Slack queue full for channel {channel}, dropping message")
+            return False
+
+    async def _next_batch(self, queue: asyncio.Queue) -> List[QueuedMessage]:
+        batch = [await queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SLACK_DIGEST_WINDOW
+        while len(batch) < SLACK_QUEUE_MAXSIZE:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_sender(self, channel: str, queue: asyncio.Queue) -> None:
+        while True:
+            batch = await self._next_batch(queue)
+            try:
+                digests = build_digests(batch)
+                SLACK_EVENTS_COALESCED.inc(len(batch) - len(digests))
+                for slack_message in digests:
+                    result = await self.slack_service.post_message(slack_message, channel)
+                    if result.status == "error":
+                        logger.warning(f"Failed to send Slack message: {result.message}")
+            except Exception as e:
+                logger.exception(f"Unexpected error in Slack sender for {channel}: {e}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def start(self) -> None:
+        self._closed = False
+
+    async def stop(self, timeout: float = SLACK_QUEUE_DRAIN_TIMEOUT) -> None:
+        """Stop accepting messages, give queued ones `timeout` seconds to go out, then cancel."""
+        self._closed = True
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues.values())),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            pending = sum(queue.qsize() for queue in self._queues.values())
+            logger.warning(f"Slack queue shutdown timed out with {pending} message(s) unsent")
+
+        for task in self._senders.values():
+            task.cancel()
+        await asyncio.gather(*self._senders.values(), return_exceptions=True)
+        self._queues.clear()
+        self._senders.clear()
+
+    def depth(self) -> Dict[str, int]:
+        return {channel: queue.qsize() for channel, queue in self._queues.items()}
+
+
+slack_message_queue = SlackMessageQueue()
@@ -0,0 +1,113 @@
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from utils.config import (
+    MAP_REDUCE_CHUNK_TOKENS,
+    OPENAI_MODEL,
+    OPENAI_SMALL_MODEL,
+    ROUTE_SMALL_MAX_LINES,
+    ROUTE_SMALL_MAX_TOKENS,
+    ROUTE_STANDARD_MAX_LINES,
+    ROUTE_STANDARD_MAX_TOKENS,
+    ROUTE_TEMPLATE_MAX_FILES,
+    ROUTE_TEMPLATE_MAX_LINES,
+    SUMMARY_ROUTING_ENABLED,
+)
+from utils.diff_filter import DiffFilterReport, count_changed_lines
+from utils.summary_schema import FileChange, PRSummary
+from utils.telemetry import SUMMARY_ROUTES
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE = "template"  # Built from the diff stats, no LLM call
+SMALL = "small"  # One completion on the small model with a tight token limit
+STANDARD = "standard"  # One completion on OPENAI_MODEL
+MAP_REDUCE = "map_reduce"  # Per-file map steps then a merge
+
+@dataclass
+class SummaryRoute:
+    name: str
+    reason: str
+    model: Optional[str] = None
+    max_tokens: int = 0
+
+
+def choose_route(
+    changed_files: int,
+    additions: int,
+    deletions: int,
+    file_diffs: List[Tuple[str, str]],
+    filter_report: DiffFilterReport,
+) -> SummaryRoute:
+    """Pick the cheapest summarization path that suits the PR's size"""
+    changed_lines = additions + deletions
+    # Whitespace-only files are not counted: they are routed by their raw line counts
+    collapsed = (
+        len(filter_report.generated_files)
+        + len(filter_report.binary_files)
+        + len(filter_report.rename_only_files)
+    )
+
+    tokens = filter_report.tokens_after
+    # Only size sends a PR to map-reduce: a single prompt cannot hold it, or it is past the standard limit
+    oversized = tokens > MAP_REDUCE_CHUNK_TOKENS
+
+    if not SUMMARY_ROUTING_ENABLED:
+        route = (
+            SummaryRoute(MAP_REDUCE, f"~{tokens} tokens", OPENAI_MODEL)
+            if oversized
+            else SummaryRoute(STANDARD, "routing disabled", OPENAI_MODEL, ROUTE_STANDARD_MAX_TOKENS)
+        )
+    elif file_diffs and collapsed == len(file_diffs):
+        route = SummaryRoute(TEMPLATE, "only generated, binary or renamed files")
+    elif changed_files <= ROUTE_TEMPLATE_MAX_FILES and changed_lines <= ROUTE_TEMPLATE_MAX_LINES:
+        route = SummaryRoute(TEMPLATE, f"{changed_files} file(s), {changed_lines} line(s)")
+    elif changed_lines <= ROUTE_SMALL_MAX_LINES and not oversized:
+        route = SummaryRoute(
+            SMALL, f"{changed_lines} changed lines", OPENAI_SMALL_MODEL, ROUTE_SMALL_MAX_TOKENS
+        )
+    elif changed_lines <= ROUTE_STANDARD_MAX_LINES and not oversized:
+        route = SummaryRoute(
+            STANDARD, f"{changed_lines} changed lines", OPENAI_MODEL, ROUTE_STANDARD_MAX_TOKENS
+        )
+    else:
+        route = SummaryRoute(MAP_REDUCE, f"{changed_lines} changed lines, ~{tokens} tokens", OPENAI_MODEL)
+
+    return route
+
+
+def record_route(route: SummaryRoute) -> None:
+    """Count the route a summary was finally produced on"""
+    SUMMARY_ROUTES.labels(route.name).inc()
+    logger.debug(f"Summary route: {route.name} ({route.reason})")
+
+
+def escalate_route(route: SummaryRoute) -> SummaryRoute:
+    """The standard route, for a small-route reply that was cut off at its token limit"""
+    logger.info(f"Small route hit its {route.max_tokens}-token limit; retrying on the standard route")
+    return SummaryRoute(
+        STANDARD, f"{route.reason}, small reply truncated", OPENAI_MODEL, ROUTE_STANDARD_MAX_TOKENS
+    )
+
+
+def template_summary(
+    title: str, file_diffs: List[Tuple[str, str]], additions: int, deletions: int
+) -> PRSummary:
+    """A summary of a trivial PR built from its title and diff stats"""
+    file_changes = []
+    for file_path, file_diff in file_diffs:
+        # Collapsed files carry the filter's note, e.g. "[binary file changed]"
+        note = file_diff.rsplit("\n", 1)[-1]
+        if note.startswith("[") and note.endswith("]"):
+            description = note[1].upper() + note[2:-1]
+        else:
+            file_additions, file_deletions = count_changed_lines(file_diff)
+            description = f"+{file_additions}/-{file_deletions} lines"
+        file_changes.append(FileChange(filename=file_path, description=description))
+
+    return PRSummary(
+        overall_summary=f"{title} (small change: +{additions}/-{deletions} lines).",
+        file_changes=file_changes,
+        technical_details="Summarized from the diff without AI analysis because the change is trivial.",
+    )
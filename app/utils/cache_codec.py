@@ -0,0 +1,54 @@
+import zlib
+from typing import Any, Dict, Iterable, Mapping, Optional, Union
+
+import msgpack
+
+from utils.config import CACHE_COMPRESS_LEVEL, CACHE_COMPRESS_MIN_BYTES
+
+# Encoded values start with MAGIC, then a format version byte, then a flags byte. 0xC1 is unused by
+# msgpack and can never start a UTF-8 string, so values written before this encoding (plain
+# strings) are told apart and decoded as they are. That is the migration path: old entries keep
+# working until they are rewritten or expire.
+MAGIC = b"\xc1"
+VERSION = 1
+FLAG_ZLIB = 0x01
+
+_HEADER = MAGIC + bytes([VERSION])
+
+
+def encode_value(value: Any) -> bytes:
+    payload = msgpack.packb(value, use_bin_type=True)
+    flags = 0
+    if len(payload) >= CACHE_COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(payload, CACHE_COMPRESS_LEVEL)
+        if len(compressed) < len(payload):
+            payload, flags = compressed, FLAG_ZLIB
+    return _HEADER + bytes([flags]) + payload
+
+
+def decode_value(raw: Optional[Union[bytes, str]]) -> Any:
+    if raw is None or isinstance(raw, str):
+        return raw
+    if not raw.startswith(MAGIC):
+        return raw.decode("utf-8")  # Legacy plain-string value
+
+    version, flags = raw[1], raw[2]
+    if version != VERSION:
+        raise ValueError(f"Unsupported cache encoding version {version}")
+    payload = raw[3:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    return msgpack.unpackb(payload, raw=False)
+
+
+def encode_hash(fields: Mapping[str, Any], plain_fields: Iterable[str] = ()) -> Dict[str, Union[bytes, str]]:
+    """Encode hash fields, leaving plain_fields as strings so Lua scripts can compare them"""
+    plain = set(plain_fields)
+    return {
+        name: str(value) if name in plain else encode_value(value)
+        for name, value in fields.items()
+    }
+
+
+def decode_hash(raw: Mapping[bytes, bytes]) -> Dict[str, Any]:
+    return {name.decode("utf-8"): decode_value(value) for name, value in raw.items()}
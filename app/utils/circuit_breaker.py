@@ -0,0 +1,89 @@
+import logging
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the upstream while its circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable; retrying in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive upstream failures. After `reset_timeout`
+    seconds one trial call is let through (half-open): success closes the circuit, failure
+    re-opens it. `is_failure` decides which exceptions count against the upstream, and
+    `is_response` which of the rest prove it answered; only a real answer closes the circuit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        is_failure: Callable[[Exception], bool] = lambda e: True,
+        is_response: Callable[[Exception], bool] = lambda e: True,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.is_response = is_response
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def check(self) -> None:
+        """Raise CircuitOpenError if a call made now would fail fast"""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            elapsed = time.monotonic() - self.opened_at
+            raise CircuitOpenError(self.name, max(self.reset_timeout - elapsed, 1.0))
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        self.check()
+        trial = self.state == "half_open"
+        self._trial_in_flight = trial
+        try:
+            result = await fn()
+        except Exception as e:
+            if self.is_failure(e):
+                self._record_failure()
+            elif trial and self.is_response(e):
+                self._reset()  # The upstream answered, just not successfully for this request
+            raise
+        finally:
+            if trial:
+                self._trial_in_flight = False
+
+        self._reset()
+        return result
+
+    def _record_failure(self) -> None:
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+    def _reset(self) -> None:
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
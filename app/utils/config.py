@@ -0,0 +1,172 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _get_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _get_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _get_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return value.strip().lower() in ("1", "true", "yes", "on") if value else default
+
+
+def _get_list(name: str, default: list) -> list:
+    value = os.getenv(name)
+    return [item.strip() for item in value.split(",") if item.strip()] if value else default
+
+
+# Redis (cache, leases and the job queue)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# OpenAI
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")  # or gpt-4o for better quality
+OPENAI_MAX_CONCURRENCY = _get_int("OPENAI_MAX_CONCURRENCY", 16)  # In-flight completions per worker
+OPENAI_TIMEOUT = _get_float("OPENAI_TIMEOUT", 60.0)  # Seconds, per completion call
+OPENAI_MAX_RETRIES = _get_int("OPENAI_MAX_RETRIES", 2)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # Unset uses api.openai.com
+
+# LLM admission control (per worker process; split your account limits across processes)
+LLM_TOKENS_PER_MINUTE = _get_int("LLM_TOKENS_PER_MINUTE", 1_000_000)  # Estimated prompt + completion tokens
+LLM_MAX_QUEUE_DEPTH = _get_int("LLM_MAX_QUEUE_DEPTH", 200)  # Completions allowed to wait for a slot
+LLM_MAX_WAIT_INTERACTIVE = _get_float("LLM_MAX_WAIT_INTERACTIVE", 20.0)  # Seconds queued before shedding
+LLM_MAX_WAIT_BACKGROUND = _get_float("LLM_MAX_WAIT_BACKGROUND", 120.0)
+LLM_MAX_WAIT_PREWARM = _get_float("LLM_MAX_WAIT_PREWARM", 300.0)
+
+# Slack channel messages
+SLACK_CHANNEL_RATE = _get_float("SLACK_CHANNEL_RATE", 1.0)  # Messages per second per channel
+SLACK_CHANNEL_BURST = _get_float("SLACK_CHANNEL_BURST", 1.0)
+SLACK_QUEUE_MAXSIZE = _get_int("SLACK_QUEUE_MAXSIZE", 1000)  # Pending messages per channel
+SLACK_QUEUE_DRAIN_TIMEOUT = _get_float("SLACK_QUEUE_DRAIN_TIMEOUT", 10.0)  # Seconds allowed on shutdown
+SLACK_DIGEST_WINDOW = _get_float("SLACK_DIGEST_WINDOW", 0.0)  # Seconds to gather more events per message; 0 = only what queued up
+SLACK_DIGEST_MAX_ITEMS = _get_int("SLACK_DIGEST_MAX_ITEMS", 50)  # Events listed per digest message
+
+# Shared HTTP clients (GitHub API and Slack response_url)
+HTTP_MAX_CONNECTIONS = _get_int("HTTP_MAX_CONNECTIONS", 100)
+HTTP_MAX_KEEPALIVE_CONNECTIONS = _get_int("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)
+HTTP_KEEPALIVE_EXPIRY = _get_float("HTTP_KEEPALIVE_EXPIRY", 30.0)  # Seconds an idle connection is kept
+GITHUB_TIMEOUT = _get_float("GITHUB_TIMEOUT", 30.0)
+GITHUB_DIFF_MAX_BYTES = _get_int("GITHUB_DIFF_MAX_BYTES", 5 * 1024 * 1024)  # Diff download stops here (decoded)
+GITHUB_DIFF_MAX_LINE_BYTES = _get_int("GITHUB_DIFF_MAX_LINE_BYTES", 64 * 1024)  # Longer lines are cut
+GITHUB_CACHE_TTL = _get_int("GITHUB_CACHE_TTL", 7 * 24 * 3600)  # Cached responses + ETags for conditional requests
+GITHUB_DIFF_CACHE_MAX_BYTES = _get_int("GITHUB_DIFF_CACHE_MAX_BYTES", 1024 * 1024)  # Larger diffs are not kept
+SLACK_RESPONSE_TIMEOUT = _get_float("SLACK_RESPONSE_TIMEOUT", 10.0)
+
+# Upstream API roots, overridable to point at local stand-ins (see bench/)
+GITHUB_API_BASE_URL = os.getenv("GITHUB_API_BASE_URL", "https://api.github.com").rstrip("/")
+SLACK_API_BASE_URL = os.getenv("SLACK_API_BASE_URL", "https://slack.com/api/")
+
+# Summary single-flight (cross-worker lease held in Redis while a summary is computed)
+SUMMARY_LEASE_TTL = _get_float("SUMMARY_LEASE_TTL", 120.0)  # Seconds; should exceed GitHub + OpenAI time
+SUMMARY_LEASE_POLL_INTERVAL = _get_float("SUMMARY_LEASE_POLL_INTERVAL", 0.5)
+
+# Summary cache
+SHA_CACHE_TTL = _get_int("SHA_CACHE_TTL", 7 * 24 * 3600)  # Seconds, for entries tagged with a head SHA
+
+# Per-file summaries (keyed by a hash of each file's hunks)
+FILE_SUMMARY_TTL = _get_int("FILE_SUMMARY_TTL", 30 * 24 * 3600)
+
+# Map-reduce summarization of large diffs
+MAP_REDUCE_CHUNK_TOKENS = _get_int("MAP_REDUCE_CHUNK_TOKENS", 6000)  # Estimated prompt tokens per map chunk
+
+# Diff noise filtering and prompt token budget
+DIFF_FILTER_ENABLED = _get_bool("DIFF_FILTER_ENABLED", True)
+DIFF_IGNORE_PATTERNS = _get_list(
+    "DIFF_IGNORE_PATTERNS",
+    [
+        "package-lock.json",
+        "yarn.lock",
+        "pnpm-lock.yaml",
+        "poetry.lock",
+        "Pipfile.lock",
+        "Cargo.lock",
+        "go.sum",
+        "composer.lock",
+        "Gemfile.lock",
+        "vendor/*",
+        "*/vendor/*",
+        "node_modules/*",
+        "dist/*",
+        "*.min.js",
+        "*.min.css",
+        "*.map",
+        "*_pb2.py",
+        "*_pb2_grpc.py",
+        "*.pb.go",
+        "*.generated.*",
+        "*.snap",
+    ],
+)
+DIFF_MAX_CONTEXT_LINES = _get_int("DIFF_MAX_CONTEXT_LINES", 2)  # Unchanged lines kept around each change
+DIFF_TOKEN_BUDGET = _get_int("DIFF_TOKEN_BUDGET", 0)  # 0 uses the model's default budget
+
+# Durable job queue (Redis Streams) and summarization workers
+JOB_QUEUE_ENABLED = _get_bool("JOB_QUEUE_ENABLED", True)  # False runs jobs as in-process background tasks
+WORKER_CONCURRENCY = _get_int("WORKER_CONCURRENCY", 8)  # Jobs processed at once per worker process
+EMBEDDED_WORKER_CONCURRENCY = _get_int("EMBEDDED_WORKER_CONCURRENCY", 4)  # Jobs the web app runs itself; 0 leaves them to worker.py
+JOB_VISIBILITY_TIMEOUT = _get_float("JOB_VISIBILITY_TIMEOUT", 300.0)  # Seconds before a silent job is reclaimed
+JOB_MAX_ATTEMPTS = _get_int("JOB_MAX_ATTEMPTS", 3)
+JOB_RETRY_BASE_DELAY = _get_float("JOB_RETRY_BASE_DELAY", 5.0)  # Seconds, doubled per attempt
+JOB_POLL_TIMEOUT = _get_float("JOB_POLL_TIMEOUT", 1.0)  # Seconds a worker blocks waiting for new jobs
+WORKER_SHUTDOWN_TIMEOUT = _get_float("WORKER_SHUTDOWN_TIMEOUT", 30.0)  # Seconds running jobs get to finish
+
+# GitHub webhooks: verified, deduplicated by delivery ID, then processed from the job queue
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "")  # Unset skips signature checks
+WEBHOOK_DELIVERY_TTL = _get_int("WEBHOOK_DELIVERY_TTL", 24 * 3600)  # Seconds a delivery ID is remembered
+
+# Pre-warming summaries from PR webhooks (needs the job queue)
+PREWARM_ENABLED = _get_bool("PREWARM_ENABLED", False)
+PREWARM_DEBOUNCE = _get_float("PREWARM_DEBOUNCE", 30.0)  # Seconds to wait for more pushes before summarizing
+PREWARM_TTL = _get_int("PREWARM_TTL", 3600)  # Seconds a pending pre-warm may keep being deferred
+
+# In-process cache tier in front of Redis (invalidated over Redis pub/sub)
+LOCAL_CACHE_MAX_ENTRIES = _get_int("LOCAL_CACHE_MAX_ENTRIES", 1000)  # 0 disables the tier
+LOCAL_CACHE_MAX_BYTES = _get_int("LOCAL_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+LOCAL_CACHE_TTL = _get_float("LOCAL_CACHE_TTL", 60.0)  # Seconds; bounds staleness if an invalidation is missed
+
+# Cache value encoding (msgpack, zlib-compressed above the threshold)
+CACHE_COMPRESS_MIN_BYTES = _get_int("CACHE_COMPRESS_MIN_BYTES", 512)
+CACHE_COMPRESS_LEVEL = _get_int("CACHE_COMPRESS_LEVEL", 6)
+
+# Upstream circuit breakers (GitHub, OpenAI) and stale-while-revalidate
+CIRCUIT_FAILURE_THRESHOLD = _get_int("CIRCUIT_FAILURE_THRESHOLD", 5)  # Consecutive failures before failing fast
+CIRCUIT_RESET_TIMEOUT = _get_float("CIRCUIT_RESET_TIMEOUT", 30.0)  # Seconds before a trial call is let through
+SUMMARY_STALE_TTL = _get_int("SUMMARY_STALE_TTL", 7 * 24 * 3600)  # Seconds a summary is kept past freshness
+
+# Streaming summaries into Slack as they are generated
+SUMMARY_STREAMING_ENABLED = _get_bool("SUMMARY_STREAMING_ENABLED", True)
+SLACK_STREAM_UPDATE_INTERVAL = _get_float("SLACK_STREAM_UPDATE_INTERVAL", 1.0)  # Min seconds between edits
+SLACK_RESPONSE_URL_MAX_USES = _get_int("SLACK_RESPONSE_URL_MAX_USES", 5)  # Slack's limit per response_url
+
+# Batch /summarizepr: several PR links, or every PR merged in a compare range, in one command
+BATCH_MAX_PRS = _get_int("BATCH_MAX_PRS", 30)
+BATCH_SUMMARY_CONCURRENCY = _get_int("BATCH_SUMMARY_CONCURRENCY", 4)  # PRs fetched and summarized at once
+BATCH_COMPARE_MAX_COMMITS = _get_int("BATCH_COMPARE_MAX_COMMITS", 1000)  # Commits read from a compare range
+SLACK_MESSAGE_MAX_CHARS = _get_int("SLACK_MESSAGE_MAX_CHARS", 12000)  # Buffered replies are packed up to this
+
+# Summary routing by PR size: template (no LLM) -> small model -> standard model -> map-reduce
+SUMMARY_ROUTING_ENABLED = _get_bool("SUMMARY_ROUTING_ENABLED", True)
+OPENAI_SMALL_MODEL = os.getenv("OPENAI_SMALL_MODEL", OPENAI_MODEL)  # For small PRs
+ROUTE_TEMPLATE_MAX_FILES = _get_int("ROUTE_TEMPLATE_MAX_FILES", 1)
+ROUTE_TEMPLATE_MAX_LINES = _get_int("ROUTE_TEMPLATE_MAX_LINES", 6)  # Additions + deletions
+ROUTE_SMALL_MAX_LINES = _get_int("ROUTE_SMALL_MAX_LINES", 150)
+ROUTE_SMALL_MAX_TOKENS = _get_int("ROUTE_SMALL_MAX_TOKENS", 600)  # Completion tokens for the small model
+ROUTE_STANDARD_MAX_TOKENS = _get_int("ROUTE_STANDARD_MAX_TOKENS", 1500)
+ROUTE_STANDARD_MAX_LINES = _get_int("ROUTE_STANDARD_MAX_LINES", 1000)  # Larger PRs go through map-reduce
+
+# Observability
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" (one object per line) or "text"
+EVENT_LOOP_LAG_INTERVAL = _get_float("EVENT_LOOP_LAG_INTERVAL", 1.0)  # Seconds between lag probes
+WORKER_METRICS_PORT = _get_int("WORKER_METRICS_PORT", 0)  # >0 serves /metrics from worker.py
+OTEL_ENABLED = _get_bool("OTEL_ENABLED", False)  # Needs opentelemetry-sdk + opentelemetry-exporter-otlp
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "slack-gpt-bot")
@@ -0,0 +1,107 @@
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+CHARS_PER_TOKEN = 4  # Rough average for code and English with OpenAI tokenizers
+
+
+@dataclass
+class DiffChunk:
+    file_paths: List[str] = field(default_factory=list)
+    parts: List[str] = field(default_factory=list)
+    tokens: int = 0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.parts)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_file_diff(file_diff: str) -> Tuple[str, List[str]]:
+    """Split one file's diff into its header (diff --git, index, ---/+++ lines) and its hunks"""
+    header_lines = []
+    hunks = []
+
+    for line in file_diff.split("\n"):
+        if line.startswith("@@"):
+            hunks.append([line])
+        elif hunks:
+            hunks[-1].append(line)
+        else:
+            header_lines.append(line)
+
+    return "\n".join(header_lines), ["\n".join(hunk) for hunk in hunks]
+
+
+def _split_by_lines(text: str, max_tokens: int) -> List[str]:
+    # Last resort for a single hunk larger than the budget
+    pieces = []
+    current = []
+    current_tokens = 0
+
+    for line in text.split("\n"):
+        line_tokens = estimate_tokens(line)
+        if current and current_tokens + line_tokens > max_tokens:
+            pieces.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line[: max_tokens * CHARS_PER_TOKEN])
+        current_tokens += line_tokens
+
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def _split_large_file(file_diff: str, max_tokens: int) -> List[str]:
+    """Split an oversized file diff on hunk boundaries, repeating the file header in every part"""
+    header, hunks = split_file_diff(file_diff)
+    budget = max(max_tokens - estimate_tokens(header), 1)
+
+    pieces = []
+    for hunk in hunks:
+        pieces.extend(_split_by_lines(hunk, budget) if estimate_tokens(hunk) > budget else [hunk])
+
+    parts = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > budget:
+            parts.append("\n".join([header] + current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece_tokens
+
+    if current or not parts:
+        parts.append("\n".join([header] + current))
+    return parts
+
+
+def chunk_file_diffs(file_diffs: List[Tuple[str, str]], max_tokens: int) -> List[DiffChunk]:
+    """
+    Pack (file path, file diff) pairs into chunks of at most ~max_tokens. Small files share a
+    chunk; a file that does not fit on its own is split across chunks on hunk boundaries.
+    """
+    chunks = []
+    current = DiffChunk()
+
+    for file_path, file_diff in file_diffs:
+        file_tokens = estimate_tokens(file_diff)
+
+        if file_tokens > max_tokens:
+            for part in _split_large_file(file_diff, max_tokens):
+                chunks.append(DiffChunk([file_path], [part], estimate_tokens(part)))
+            continue
+
+        if current.parts and current.tokens + file_tokens > max_tokens:
+            chunks.append(current)
+            current = DiffChunk()
+        current.file_paths.append(file_path)
+        current.parts.append(file_diff)
+        current.tokens += file_tokens
+
+    if current.parts:
+        chunks.append(current)
+    return chunks
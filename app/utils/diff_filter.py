@@ -0,0 +1,214 @@
+import fnmatch
+import posixpath
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from utils.config import (
+    DIFF_FILTER_ENABLED,
+    DIFF_IGNORE_PATTERNS,
+    DIFF_MAX_CONTEXT_LINES,
+    DIFF_TOKEN_BUDGET,
+)
+from utils.diff_chunker import CHARS_PER_TOKEN, estimate_tokens, split_file_diff
+from utils.server_utils import extract_meaningful_changes
+
+# Total diff tokens we are willing to send per PR, by model. Map-reduce spreads them over several calls.
+MODEL_TOKEN_BUDGETS = {
+    "gpt-4o-mini": 120_000,
+    "gpt-4o": 120_000,
+    "gpt-4.1-mini": 400_000,
+    "gpt-4.1": 400_000,
+}
+DEFAULT_TOKEN_BUDGET = 100_000
+
+
+@dataclass
+class DiffFilterReport:
+    generated_files: List[str] = field(default_factory=list)
+    binary_files: List[str] = field(default_factory=list)
+    rename_only_files: List[str] = field(default_factory=list)
+    whitespace_only_files: List[str] = field(default_factory=list)
+    budget_trimmed_files: List[str] = field(default_factory=list)
+    whitespace_hunks: int = 0
+    context_lines_trimmed: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    diff_truncated: bool = False  # The fetch stopped at GITHUB_DIFF_MAX_BYTES
+
+    def describe(self) -> str:
+        """User-facing note of what was left out of the analysis, or '' if nothing meaningful was"""
+        notes = []
+        if self.generated_files:
+            notes.append(f"{len(self.generated_files)} generated/vendored file(s)")
+        if self.binary_files:
+            notes.append(f"{len(self.binary_files)} binary file(s)")
+        if self.whitespace_hunks:
+            notes.append(f"{self.whitespace_hunks} whitespace-only hunk(s)")
+        if self.budget_trimmed_files:
+            notes.append(f"parts of {len(self.budget_trimmed_files)} large file(s) to fit the token budget")
+        if self.diff_truncated:
+            notes.append("files past the diff size limit")
+        return f"Omitted from analysis: {', '.join(notes)}" if notes else ""
+
+
+def token_budget_for_model(model: str) -> int:
+    return DIFF_TOKEN_BUDGET or MODEL_TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET)
+
+
+def _is_generated(file_path: str) -> bool:
+    name = posixpath.basename(file_path)
+    return any(
+        fnmatch.fnmatch(file_path, pattern) or fnmatch.fnmatch(name, pattern)
+        for pattern in DIFF_IGNORE_PATTERNS
+    )
+
+
+def _collapse(header: str, note: str) -> str:
+    # Keep the 'diff --git' line so the file still shows up in FILE CHANGES
+    first_line = header.split("\n", 1)[0]
+    return f"{first_line}\n[{note}]"
+
+
+def count_changed_lines(file_diff: str) -> Tuple[int, int]:
+    additions = deletions = 0
+    for line in file_diff.split("\n"):
+        if line.startswith("+") and not line.startswith("+++"):
+            additions += 1
+        elif line.startswith("-") and not line.startswith("---"):
+            deletions += 1
+    return additions, deletions
+
+
+def _is_whitespace_only(hunk: str) -> bool:
+    """
+    True when the added lines match the removed lines one for one, in order, apart from trailing
+    whitespace and line endings. Indentation changes are kept: they matter in Python and YAML.
+    """
+    added = []
+    removed = []
+    for change in extract_meaningful_changes(hunk):
+        (added if change["type"] == "addition" else removed).append(change["content"].rstrip())
+    return bool(added) and added == removed
+
+
+def _trim_context(hunk: str, max_context: int) -> Tuple[str, int]:
+    """Drop unchanged lines more than max_context lines away from any change"""
+    lines = hunk.split("\n")
+    body = lines[1:]
+
+    keep = set()
+    for i, line in enumerate(body):
+        if line.startswith(("+", "-")):
+            keep.update(range(i - max_context, i + max_context + 1))
+
+    trimmed_lines = [lines[0]]
+    trimmed = 0
+    for i, line in enumerate(body):
+        is_context = line.startswith(" ") or line == ""
+        if is_context and i not in keep:
+            if trimmed_lines[-1] != " ...":
+                trimmed_lines.append(" ...")
+            trimmed += 1
+        else:
+            trimmed_lines.append(line)
+
+    return "\n".join(trimmed_lines), trimmed
+
+
+def _filter_file_diff(file_path: str, file_diff: str, report: DiffFilterReport) -> str:
+    header, hunks = split_file_diff(file_diff)
+
+    if _is_generated(file_path):
+        report.generated_files.append(file_path)
+        additions, deletions = count_changed_lines(file_diff)
+        return _collapse(header, f"generated or vendored file: +{additions}/-{deletions} lines omitted")
+
+    if "Binary files" in header or "GIT binary patch" in header:
+        report.binary_files.append(file_path)
+        return _collapse(header, "binary file changed")
+
+    if not hunks and "rename from" in header:
+        report.rename_only_files.append(file_path)
+        rename_lines = [line for line in header.split("\n") if line.startswith(("rename from", "rename to"))]
+        return _collapse(header, f"{'; '.join(rename_lines)} with no content changes")
+
+    kept_hunks = []
+    for hunk in hunks:
+        if _is_whitespace_only(hunk):
+            report.whitespace_hunks += 1
+            continue
+        hunk, trimmed = _trim_context(hunk, DIFF_MAX_CONTEXT_LINES)
+        report.context_lines_trimmed += trimmed
+        kept_hunks.append(hunk)
+
+    if hunks and not kept_hunks:
+        report.whitespace_only_files.append(file_path)
+        return _collapse(header, "whitespace-only changes")
+
+    return "\n".join([header] + kept_hunks)
+
+
+def _truncate_file_diff(file_diff: str, max_tokens: int) -> str:
+    """Keep the header and as many whole hunks as fit, noting how many were elided"""
+    header, hunks = split_file_diff(file_diff)
+    kept = [header]
+    used = estimate_tokens(header)
+
+    for i, hunk in enumerate(hunks):
+        hunk_tokens = estimate_tokens(hunk)
+        if used + hunk_tokens > max_tokens:
+            if i == 0:
+                # Not even one hunk fits: keep its first lines
+                kept.append(hunk[: max(max_tokens - used, 0) * CHARS_PER_TOKEN].rsplit("\n", 1)[0])
+            kept.append(f"[{len(hunks) - i} more hunk(s) elided to fit the token budget]")
+            break
+        kept.append(hunk)
+        used += hunk_tokens
+
+    return "\n".join(kept)
+
+
+def _fit_to_budget(
+    file_diffs: List[Tuple[str, str]], token_budget: int, report: DiffFilterReport
+) -> List[Tuple[str, str]]:
+    sizes = [estimate_tokens(file_diff) for _, file_diff in file_diffs]
+    if sum(sizes) <= token_budget:
+        return file_diffs
+
+    # Water-filling: files under the fair share stay whole, the largest split what is left
+    caps = {}
+    remaining = token_budget
+    order = sorted(range(len(file_diffs)), key=sizes.__getitem__)
+    for position, i in enumerate(order):
+        caps[i] = min(sizes[i], remaining // (len(order) - position))
+        remaining -= caps[i]
+
+    fitted = []
+    for i, (file_path, file_diff) in enumerate(file_diffs):
+        if caps[i] < sizes[i]:
+            truncated = _truncate_file_diff(file_diff, caps[i])
+            if truncated != file_diff:
+                report.budget_trimmed_files.append(file_path)
+                file_diff = truncated
+        fitted.append((file_path, file_diff))
+    return fitted
+
+
+def filter_diff(
+    file_diffs: List[Tuple[str, str]], token_budget: int
+) -> Tuple[List[Tuple[str, str]], DiffFilterReport]:
+    """
+    Pre-LLM stage: collapse generated, binary and rename-only files, drop whitespace-only hunks,
+    cap context lines (when DIFF_FILTER_ENABLED), then trim the result to token_budget.
+    """
+    report = DiffFilterReport(tokens_before=sum(estimate_tokens(fd) for _, fd in file_diffs))
+
+    if DIFF_FILTER_ENABLED:
+        file_diffs = [
+            (file_path, _filter_file_diff(file_path, file_diff, report))
+            for file_path, file_diff in file_diffs
+        ]
+
+    file_diffs = _fit_to_budget(file_diffs, token_budget, report)
+    report.tokens_after = sum(estimate_tokens(fd) for _, fd in file_diffs)
+    return file_diffs, report
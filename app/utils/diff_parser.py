@@ -0,0 +1,125 @@
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import httpx
+
+# (file path, file diff text): one compact record per file instead of one object per line
+FileDiff = Tuple[str, str]
+
+
+class ParsedDiff:
+    """Files parsed from a (possibly truncated) diff"""
+
+    __slots__ = ("files", "num_bytes", "truncated")
+
+    def __init__(self, files: List[FileDiff], num_bytes: int, truncated: bool):
+        self.files = files
+        self.num_bytes = num_bytes
+        self.truncated = truncated
+
+
+def file_path_from_diff_header(line: str) -> Optional[str]:
+    # Extract file path: diff --git a/path/to/file.py b/path/to/file.py
+    parts = line.split()
+    if len(parts) >= 4:
+        return parts[2][2:]  # Remove 'a/' prefix
+    return None
+
+
+def iter_lines(text: str) -> Iterator[str]:
+    """Yield the lines of text without materializing a list of them"""
+    start = 0
+    while True:
+        end = text.find("\n", start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+class IncrementalDiffParser:
+    """Feed diff lines one at a time; a file's record is emitted once the next file starts (or on close)."""
+
+    __slots__ = ("_current_file", "_current_lines")
+
+    def __init__(self):
+        self._current_file: Optional[str] = None
+        self._current_lines: List[str] = []
+
+    def feed(self, line: str) -> Optional[FileDiff]:
+        if line.startswith("diff --git"):
+            finished = self._flush()
+            self._current_file = file_path_from_diff_header(line)
+            self._current_lines = [line]
+            return finished
+        if self._current_lines:
+            self._current_lines.append(line)
+        return None
+
+    def close(self) -> Optional[FileDiff]:
+        return self._flush()
+
+    def _flush(self) -> Optional[FileDiff]:
+        if not self._current_lines:
+            return None
+        record = (self._current_file, "\n".join(self._current_lines))
+        self._current_lines = []
+        return record
+
+
+def iter_file_diffs(lines: Iterable[str]) -> Iterator[FileDiff]:
+    parser = IncrementalDiffParser()
+    for line in lines:
+        record = parser.feed(line)
+        if record:
+            yield record
+    record = parser.close()
+    if record:
+        yield record
+
+
+async def read_diff_stream(response: httpx.Response, max_bytes: int, max_line_bytes: int) -> ParsedDiff:
+    """
+    Parse a streamed diff response file by file. Bytes are counted after content decoding and
+    reading stops once max_bytes have arrived, so a gzipped response cannot exceed the cap.
+    Lines longer than max_line_bytes (e.g. minified files) are cut, so memory stays bounded by
+    the caps rather than by the size of the diff or of any one line.
+    """
+    parser = IncrementalDiffParser()
+    files: List[FileDiff] = []
+    num_bytes = 0
+    line = bytearray()  # The line being read, up to max_line_bytes of it
+    line_cut = False
+
+    def feed() -> None:
+        text = line.decode("utf-8", errors="replace").rstrip("\r")
+        record = parser.feed(text + " [line truncated]" if line_cut else text)
+        if record:
+            files.append(record)
+
+    async for chunk in response.aiter_bytes():
+        num_bytes += len(chunk)
+        if num_bytes > max_bytes:
+            # The file being parsed is incomplete; drop it rather than summarize half a hunk
+            return ParsedDiff(files, num_bytes, truncated=True)
+
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end == -1 else chunk[start:end]
+            room = max_line_bytes - len(line)
+            line += piece[:room]
+            line_cut = line_cut or len(piece) > room
+            if end == -1:
+                break
+            feed()
+            line.clear()
+            line_cut = False
+            start = end + 1
+
+    if line or line_cut:
+        feed()
+    record = parser.close()
+    if record:
+        files.append(record)
+    return ParsedDiff(files, num_bytes, truncated=False)
@@ -0,0 +1,95 @@
+import os
+from typing import Optional
+
+import aiohttp
+import httpx
+from slack_sdk.web.async_client import AsyncWebClient
+
+from utils.config import (
+    GITHUB_TIMEOUT,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    SLACK_API_BASE_URL,
+    SLACK_RESPONSE_TIMEOUT,
+)
+from utils.telemetry import RATE_LIMITED
+
+# Long-lived clients so requests reuse pooled HTTP/2 connections instead of a fresh TCP+TLS handshake.
+# Created in the app lifespan; the getters create them lazily for code running outside the app.
+_github_client: Optional[httpx.AsyncClient] = None
+_slack_client: Optional[httpx.AsyncClient] = None
+# slack_sdk's async client runs on aiohttp; without a session it opens (and closes) one per call
+_slack_session: Optional[aiohttp.ClientSession] = None
+_slack_web_client: Optional[AsyncWebClient] = None
+
+
+def count_rate_limits(upstream: str):
+    """httpx response hook counting 429s from upstream"""
+
+    async def hook(response: httpx.Response) -> None:
+        if response.status_code == 429:
+            RATE_LIMITED.labels(upstream).inc()
+
+    return hook
+
+
+def _build_client(upstream: str, timeout: float) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=timeout,
+        event_hooks={"response": [count_rate_limits(upstream)]},
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_github_client() -> httpx.AsyncClient:
+    global _github_client
+    if _github_client is None or _github_client.is_closed:
+        _github_client = _build_client("github", GITHUB_TIMEOUT)
+    return _github_client
+
+
+def get_slack_client() -> httpx.AsyncClient:
+    global _slack_client
+    if _slack_client is None or _slack_client.is_closed:
+        _slack_client = _build_client("slack", SLACK_RESPONSE_TIMEOUT)
+    return _slack_client
+
+
+def get_slack_web_client() -> AsyncWebClient:
+    """The Slack Web API client, on one pooled aiohttp session. Needs a running event loop."""
+    global _slack_session, _slack_web_client
+    if _slack_session is None or _slack_session.closed:
+        _slack_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=HTTP_MAX_CONNECTIONS, keepalive_timeout=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+        _slack_web_client = AsyncWebClient(
+            token=os.getenv("BOT_USER_OAUTH_TOKEN"), base_url=SLACK_API_BASE_URL, session=_slack_session
+        )
+    return _slack_web_client
+
+
+def init_http_clients() -> None:
+    get_github_client()
+    get_slack_client()
+    get_slack_web_client()
+
+
+async def close_http_clients() -> None:
+    global _github_client, _slack_client, _slack_session, _slack_web_client
+    for client in (_github_client, _slack_client):
+        if client is not None and not client.is_closed:
+            await client.aclose()
+    if _slack_session is not None and not _slack_session.closed:
+        await _slack_session.close()
+    _github_client = None
+    _slack_client = None
+    _slack_session = None
+    _slack_web_client = None
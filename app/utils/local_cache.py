@@ -0,0 +1,71 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Generic, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class LocalCache(Generic[V]):
+    """
+    In-process LRU with a per-entry TTL, bounded by entry count and by the approximate size of the
+    cached values. Not shared between processes; callers invalidate it when the source changes.
+    `version` moves on every invalidation, so a value read from the source before one is not
+    stored after it (pass the version seen before the read to set()).
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, int, V]]" = OrderedDict()  # key -> (expires, size, value)
+        self._bytes = 0
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._pop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: str, value: V, size: int, version: Optional[int] = None) -> None:
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        if version is not None and version != self.version:
+            return  # Invalidated while the value was being read
+        self._pop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def delete(self, key: str) -> None:
+        self.version += 1
+        self._pop(key)
+
+    def clear(self) -> None:
+        self.version += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
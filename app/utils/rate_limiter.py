@@ -0,0 +1,55 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Async token bucket refilling at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        # Requests larger than the bucket wait for a full bucket and then go into debt
+        needed = min(tokens, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < needed:
+                await asyncio.sleep((needed - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+    def reserve(self, tokens: float, max_delay: float) -> Optional[float]:
+        """
+        Take tokens now, borrowing against the refill if need be, and return the seconds until
+        the bucket covers them. Takes nothing and returns None if that would exceed max_delay.
+        """
+        delay = self.time_until(tokens)
+        if delay > max_delay:
+            return None
+        self.tokens -= tokens
+        return delay
+
+    def time_until(self, tokens: float) -> float:
+        """Seconds until `tokens` could be taken without borrowing"""
+        self._refill()
+        return max(0.0, (min(tokens, self.capacity) - self.tokens) / self.rate)
+
+    def refund(self, tokens: float) -> None:
+        """Return tokens taken for work that never ran"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def pause(self, seconds: float) -> None:
+        """Empty the bucket so the next acquire waits at least `seconds` (e.g. a Retry-After)."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
@@ -1,3 +1,8 @@
 from redis.asyncio import Redis
 
-redis_client = Redis(host="localhost", port=6379, db=0, decode_responses=True)
+from utils.config import REDIS_URL
+
+redis_client = Redis.from_url(REDIS_URL, decode_responses=True)
+
+# Raw bytes for values stored with utils.cache_codec
+redis_binary_client = Redis.from_url(REDIS_URL)
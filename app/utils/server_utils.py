@@ -1,31 +1,54 @@
+import hashlib
+import logging
+import re
+from typing import List, Optional
+
+from utils.diff_parser import file_path_from_diff_header, iter_file_diffs, iter_lines
+from utils.summary_schema import render_summary
+
+logger = logging.getLogger(__name__)
+
+
+PR_URL_PATTERN = re.compile(r"https://github\.com/[\w.-]+/[\w.-]+/pull/\d+")
+COMPARE_URL_PATTERN = re.compile(r"https://github\.com/[\w.-]+/[\w.-]+/compare/[^\s|>]+")
+# First line of a merge commit ("Merge pull request #12 ...") or a squash merge ("... (#12)")
+MERGED_PR_PATTERN = re.compile(r"^Merge pull request #(\d+)|\(#(\d+)\)$")
+
+
 def parse_diff_for_files(diff_content):
     """Extract file names and their change types from diff content"""
     files_changed = []
-    lines = diff_content.split("\n")
 
-    for line in lines:
+    for line in iter_lines(diff_content):
         if line.startswith("diff --git"):
-            # Extract file path: diff --git a/path/to/file.py b/path/to/file.py
-            parts = line.split()
-            if len(parts) >= 4:
-                file_path = parts[2][2:]  # Remove 'a/' prefix
+            file_path = file_path_from_diff_header(line)
+            if file_path:
                 files_changed.append(file_path)
 
     return files_changed
 
 
+def split_diff_by_file(diff_content):
+    """Split diff content into (file path, file diff) pairs, one per 'diff --git' section"""
+    return list(iter_file_diffs(iter_lines(diff_content)))
+
+
+def file_diff_hash(file_path, file_diff):
+    """Content hash of a file's hunks; header lines such as 'index' are skipped so an unchanged patch still matches after a rebase"""
+    hunk_start = file_diff.find("\n@@")
+    hunks = file_diff[hunk_start:] if hunk_start != -1 else file_diff
+    return hashlib.sha256(f"{file_path}\0{hunks}".encode("utf-8")).hexdigest()
+
+
 def extract_meaningful_changes(diff_content):
     """Extract the actual code changes (additions/deletions) from diff"""
-    lines = diff_content.split("\n")
     changes = []
     current_file = None
 
-    for line in lines:
+    for line in iter_lines(diff_content):
         if line.startswith("diff --git"):
             # New file
-            parts = line.split()
-            if len(parts) >= 4:
-                current_file = parts[2][2:]  # Remove 'a/' prefix
+            current_file = file_path_from_diff_header(line) or current_file
         elif line.startswith("@@"):
             # Hunk header - shows line numbers
             continue
@@ -52,11 +75,11 @@ def extract_meaningful_changes(diff_content):
 
 
 def print_pr_info(title, desc, files_changed, additions, deletions, diff_content):
-    print(f"PR Title: {title}")
-    print(f"PR Description: {desc}")
-    print(f"Files changed: {files_changed}")
-    print(f"Additions: +{additions}, Deletions: -{deletions}")
-    print(f"Diff content length: {len(diff_content)} characters")
+    logger.debug(f"PR Title: {title}")
+    logger.debug(f"PR Description: {desc}")
+    logger.debug(f"Files changed: {files_changed}")
+    logger.debug(f"Additions: +{additions}, Deletions: -{deletions}")
+    logger.debug(f"Diff content length: {len(diff_content)} characters")
 
 
 def get_response_text(response_dict):
@@ -64,11 +87,40 @@ def get_response_text(response_dict):
     response_text += f"📊 **Changes:** {response_dict["files_changed"]} files, +{response_dict["additions"]}/-{response_dict["deletions"]}\n"
     response_text += f"🔗 **Link:** {response_dict["html_url"]}\n"
     response_text += f"📂 **Status:** {response_dict["state"]}\n\n"
-    response_text += response_dict["summary"]
+
+    # Entries cached before structured summaries hold pre-rendered text in "summary"
+    if response_dict.get("overall_summary") is not None:
+        response_text += render_summary(response_dict)
+    else:
+        response_text += response_dict["summary"]
+
+    if response_dict.get("notes"):
+        response_text += f"\n\n_ℹ️ {response_dict["notes"]}_"
 
     return response_text
 
 
+def extract_pr_urls(text: str) -> List[str]:
+    """Every distinct PR link in a slash command's text, in order, with Slack's <url|label> markup dropped"""
+    return list(dict.fromkeys(PR_URL_PATTERN.findall(text)))
+
+
+def extract_compare_url(text: str) -> Optional[str]:
+    """The first compare link (https://github.com/owner/repo/compare/base...head) in text, if any"""
+    match = COMPARE_URL_PATTERN.search(text)
+    return match.group(0) if match else None
+
+
+def merged_pr_numbers(commit_messages: List[str]) -> List[int]:
+    """PR numbers named by merge and squash-merge commits, in order, without duplicates"""
+    numbers = []
+    for message in commit_messages:
+        match = MERGED_PR_PATTERN.search(message.split("\n", 1)[0].strip())
+        if match:
+            numbers.append(int(match.group(1) or match.group(2)))
+    return list(dict.fromkeys(numbers))
+
+
 # Extract relevant info for PR merge detection
 def extract_pr_merge_info(payload, x_github_event):
     # Check if this is a push to main branch
@@ -0,0 +1,143 @@
+import json
+from typing import Any, Dict, List, Type
+
+from pydantic import BaseModel
+
+
+class FileChange(BaseModel):
+    filename: str
+    description: str
+
+
+class PRSummary(BaseModel):
+    overall_summary: str
+    file_changes: List[FileChange]
+    technical_details: str
+
+
+class NumberedFileChange(BaseModel):
+    """A file's summary keyed by its number in the map step prompt, not by an echoed filename"""
+
+    file_number: int
+    description: str
+
+
+class FileSummaries(BaseModel):
+    """Map step output: one entry per file in a diff chunk"""
+
+    file_changes: List[NumberedFileChange]
+
+
+class MergedSummary(BaseModel):
+    """Reduce step output: the parts of a PRSummary that span files (file_changes come from the map step)"""
+
+    overall_summary: str
+    technical_details: str
+
+
+class ReleaseSummary(BaseModel):
+    """Combined summary of the PRs in a batch /summarizepr"""
+
+    overview: str
+    highlights: List[str]
+    risks: str
+
+
+# Cache fields holding a PRSummary, so views can HMGET only the parts they show
+SUMMARY_FIELDS = ("overall_summary", "file_changes", "technical_details")
+
+
+def _make_strict(schema: Dict[str, Any]) -> None:
+    # OpenAI strict mode: every property required, no extra properties, no titles/defaults
+    schema.pop("title", None)
+    schema.pop("default", None)
+    if schema.get("type") == "object":
+        schema["additionalProperties"] = False
+        schema["required"] = list(schema.get("properties", {}))
+    for key in ("properties", "$defs"):
+        for subschema in schema.get(key, {}).values():
+            _make_strict(subschema)
+    if isinstance(schema.get("items"), dict):
+        _make_strict(schema["items"])
+
+
+def response_format(model: Type[BaseModel]) -> Dict[str, Any]:
+    """The chat completions `response_format` that constrains a reply to `model`'s schema"""
+    schema = model.model_json_schema()
+    _make_strict(schema)
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model.__name__, "schema": schema, "strict": True},
+    }
+
+
+def _closing_suffix(text: str) -> str:
+    """Quote and brackets that would close every string and container left open in text"""
+    closers = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and closers:
+            closers.pop()
+    return ('"' if in_string else "") + "".join(reversed(closers))
+
+
+def parse_partial_json(text: str) -> Dict[str, Any]:
+    """
+    Best-effort parse of a JSON object that is still being streamed, for progress display only.
+    Open strings and containers are closed; a trailing key without a value is dropped.
+    """
+    start = text.find("{")
+    if start == -1:
+        return {}
+    candidate = text[start:]
+
+    while candidate:
+        candidate = candidate.rstrip().rstrip(",:").rstrip()
+        if candidate.endswith("\\"):
+            candidate = candidate[:-1]
+        try:
+            parsed = json.loads(candidate + _closing_suffix(candidate))
+            return parsed if isinstance(parsed, dict) else {}
+        except ValueError:
+            # Back off to the previous complete member and try again
+            candidate = candidate[: max(candidate.rfind(","), 1)]
+    return {}
+
+
+def render_summary(summary: Dict[str, Any]) -> str:
+    """Slack text for a summary, tolerating fields that are missing or still streaming"""
+    sections = []
+    if summary.get("overall_summary"):
+        sections.append(f"**OVERALL SUMMARY:**\n{summary['overall_summary']}")
+
+    file_lines = [
+        f"- **{change.get('filename', '')}**: {change.get('description', '')}"
+        for change in summary.get("file_changes") or []
+        if isinstance(change, dict) and change.get("filename")
+    ]
+    if file_lines:
+        sections.append("**FILE CHANGES:**\n" + "\n".join(file_lines))
+
+    if summary.get("technical_details"):
+        sections.append(f"**TECHNICAL DETAILS:**\n{summary['technical_details']}")
+    return "\n\n".join(sections)
+
+
+def render_release_summary(summary: ReleaseSummary, pr_count: int) -> str:
+    sections = [f"📦 **RELEASE SUMMARY ({pr_count} PRs):**\n{summary.overview}"]
+    if summary.highlights:
+        sections.append("**HIGHLIGHTS:**\n" + "\n".join(f"- {highlight}" for highlight in summary.highlights))
+    if summary.risks:
+        sections.append(f"**RISKS:**\n{summary.risks}")
+    return "\n\n".join(sections)
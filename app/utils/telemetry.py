@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from utils.config import OTEL_ENABLED, OTEL_SERVICE_NAME
+
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = Histogram(
+    "slackgpt_stage_seconds",
+    "Time spent in each stage of summarizing a PR",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+CACHE_LOOKUPS = Counter("slackgpt_cache_lookups_total", "Cache lookups by tier and result", ["tier", "result"])
+LLM_TOKENS = Counter("slackgpt_llm_tokens_total", "OpenAI tokens reported in usage", ["direction"])
+RETRIES = Counter("slackgpt_retries_total", "Retried upstream requests and jobs", ["source"])
+RATE_LIMITED = Counter("slackgpt_rate_limited_total", "HTTP 429 responses from upstreams", ["upstream"])
+SUMMARY_ROUTES = Counter("slackgpt_summary_routes_total", "Summaries by route", ["route"])
+SLACK_EVENTS_COALESCED = Counter(
+    "slackgpt_slack_events_coalesced_total", "Channel events folded into another message instead of posted"
+)
+JOBS_IN_FLIGHT = Gauge("slackgpt_jobs_in_flight", "Jobs being processed by this worker")
+LLM_QUEUE_DEPTH = Gauge("slackgpt_llm_queue_depth", "Completions waiting for an LLM slot")
+EVENT_LOOP_LAG = Gauge("slackgpt_event_loop_lag_seconds", "How late the last event loop probe woke up")
+
+_tracer = None
+
+
+def init_tracing() -> None:
+    """Export spans over OTLP when OTEL_ENABLED (endpoint from the standard OTEL_EXPORTER_OTLP_* env)"""
+    global _tracer
+    if not OTEL_ENABLED or _tracer is not None:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning("OTEL_ENABLED is set but opentelemetry-sdk/opentelemetry-exporter-otlp are not installed")
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("slack-gpt-bot")
+
+
+def shutdown_tracing() -> None:
+    if _tracer is not None:
+        from opentelemetry import trace
+
+        trace.get_tracer_provider().shutdown()
+
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[None]:
+    """Time a stage into STAGE_SECONDS, and trace it when OpenTelemetry is enabled"""
+    start = time.perf_counter()
+    try:
+        if _tracer is None:
+            yield
+        else:
+            attributes = {key: value for key, value in attributes.items() if value is not None}
+            with _tracer.start_as_current_span(stage, attributes=attributes):
+                yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+async def run_event_loop_lag_probe(interval: float) -> None:
+    """Sample how late a sleep wakes up; a busy or blocked loop shows up as lag"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.set(max(time.perf_counter() - start - interval, 0.0))
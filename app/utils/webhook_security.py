@@ -0,0 +1,11 @@
+import hashlib
+import hmac
+from typing import Optional
+
+
+def verify_github_signature(secret: str, body: bytes, signature_header: Optional[str]) -> bool:
+    """Check X-Hub-Signature-256 ("sha256=<hex HMAC of the raw body>") in constant time"""
+    if not signature_header or not signature_header.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header[len("sha256=") :])
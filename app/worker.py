@@ -0,0 +1,33 @@
+# Summarization worker entry: python worker.py
+import asyncio
+import signal
+
+from services.job_handlers import JOB_HANDLERS
+from services.job_queue import JobWorker
+from services.lifecycle import shutdown, startup
+from prometheus_client import start_http_server
+
+from utils.config import WORKER_CONCURRENCY, WORKER_METRICS_PORT
+from utils.logging_config import configure_logging
+
+
+async def main() -> None:
+    configure_logging()
+    if WORKER_METRICS_PORT > 0:
+        start_http_server(WORKER_METRICS_PORT)
+    await startup()
+    worker = JobWorker(handlers=JOB_HANDLERS, concurrency=WORKER_CONCURRENCY)
+
+    # Finish in-flight jobs on SIGTERM/SIGINT instead of dropping them
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+import os
+import random
+from dataclasses import dataclass
+from typing import List
+
+# (files, changed lines per file) for the synthetic PR sizes, picked by PR number
+SIZE_CLASSES = {
+    "small": (1, 4),
+    "medium": (2, 60),
+    "large": (12, 160),
+}
+
+
+@dataclass
+class BenchDiff:
+    text: str
+    changed_files: int
+    additions: int
+    deletions: int
+
+
+def _synthetic_file_diff(path: str, lines: int, rng: random.Random) -> str:
+    removed = lines // 3
+    added = lines - removed
+    body = [f" def unchanged_{i}():" for i in range(3)]
+    body += [f"-    old_value_{i} = {rng.randint(0, 999)}" for i in range(removed)]
+    body += [f"+    new_value_{i} = compute_{i}({rng.randint(0, 999)})" for i in range(added)]
+    return "\n".join(
+        [
+            f"diff --git a/{path} b/{path}",
+            f"index {rng.getrandbits(28):07x}..{rng.getrandbits(28):07x} 100644",
+            f"--- a/{path}",
+            f"+++ b/{path}",
+            f"@@ -1,{3 + removed} +1,{3 + added} @@",
+        ]
+        + body
+    )
+
+
+def synthetic_diff(size: str, seed: int) -> BenchDiff:
+    files, lines = SIZE_CLASSES[size]
+    rng = random.Random(seed)
+    file_diffs = [_synthetic_file_diff(f"src/module_{seed}_{i}.py", lines, rng) for i in range(files)]
+    removed = lines // 3
+    return BenchDiff("\n".join(file_diffs) + "\n", files, files * (lines - removed), files * removed)
+
+
+def load_recorded_diffs(directory: str) -> List[BenchDiff]:
+    """Every *.diff file in directory, e.g. saved with `curl -H 'Accept: application/vnd.github.v3.diff'`"""
+    diffs = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".diff"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        lines = text.split("\n")
+        diffs.append(
+            BenchDiff(
+                text,
+                sum(line.startswith("diff --git ") for line in lines),
+                sum(line.startswith("+") and not line.startswith("+++") for line in lines),
+                sum(line.startswith("-") and not line.startswith("---") for line in lines),
+            )
+        )
+    return diffs
+
+
+class DiffCatalog:
+    """The diff served for each PR number: recorded diffs round-robin, else synthetic sizes in turn"""
+
+    def __init__(self, recorded: List[BenchDiff], sizes: List[str]):
+        self.recorded = recorded
+        self.sizes = sizes
+        self._synthetic = {}
+
+    def for_pr(self, number: int) -> BenchDiff:
+        if self.recorded:
+            return self.recorded[number % len(self.recorded)]
+        if number not in self._synthetic:
+            self._synthetic[number] = synthetic_diff(self.sizes[number % len(self.sizes)], number)
+        return self._synthetic[number]
@@ -0,0 +1,218 @@
+"""
+Local stand-ins for the GitHub, OpenAI and Slack APIs, served from one FastAPI app:
+
+    /github/repos/{owner}/{repo}/pulls/{number}   PR JSON, or the diff for Accept: ...diff (ETags honoured)
+    /github/repos/{owner}/{repo}/compare/N...M    merge commits for PRs N+1..M, paginated
+    /openai/v1/chat/completions                   schema-shaped JSON replies, streamed or not
+    /slack/api/chat.postMessage, chat.update      channel message sink
+    /slack/response/{request_id}                  response_url sink
+
+Each upstream has its own latency and failure rate.
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+from diffs import DiffCatalog
+
+
+@dataclass
+class UpstreamProfile:
+    latency: float = 0.0  # Mean seconds per request, jittered +/-50%
+    failure_rate: float = 0.0  # Fraction of requests answered with a 5xx
+
+    async def delay(self) -> None:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+
+    def should_fail(self) -> bool:
+        return random.random() < self.failure_rate
+
+
+class Recorder:
+    """Counts upstream calls and reports response_url deliveries to the load driver"""
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        self.on_response_url: Optional[Callable[[str, float, str], None]] = None
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.calls)
+
+
+def _pr_json(owner: str, repo: str, number: int, diff) -> Dict[str, Any]:
+    return {
+        "title": f"Bench PR #{number}",
+        "body": "Synthetic pull request served by the benchmark harness.",
+        "user": {"login": "bench-bot"},
+        "state": "open",
+        "html_url": f"https://github.com/{owner}/{repo}/pull/{number}",
+        "changed_files": diff.changed_files,
+        "additions": diff.additions,
+        "deletions": diff.deletions,
+        "head": {
+            "sha": f"{number:040x}",
+            "ref": f"bench-{number}",
+            "repo": {"full_name": f"{owner}/{repo}"},
+        },
+    }
+
+
+def _completion_content(request: Dict[str, Any]) -> str:
+    """A reply shaped like the requested json_schema, naming the files mentioned in the prompt"""
+    prompt = request["messages"][-1]["content"]
+    filenames = re.findall(r"diff --git a/(\S+)", prompt) or re.findall(r"^\s*- ([^\s:]+): ", prompt, re.M)
+    file_changes = [
+        {"filename": name, "description": f"Updates {name} with refactored helpers."}
+        for name in dict.fromkeys(filenames)
+    ]
+
+    schema_name = request.get("response_format", {}).get("json_schema", {}).get("name")
+    if schema_name == "FileSummaries":
+        numbered = re.findall(r"^\s*### File (\d+): (\S+)", prompt, re.M)
+        return json.dumps(
+            {
+                "file_changes": [
+                    {"file_number": int(number), "description": f"Updates {name} with refactored helpers."}
+                    for number, name in numbered
+                ]
+            }
+        )
+    if schema_name == "MergedSummary":
+        return json.dumps(
+            {
+                "overall_summary": f"Refactors {len(file_changes)} modules and updates computed values.",
+                "technical_details": "No behaviour change expected outside the touched modules.",
+            }
+        )
+    if schema_name == "ReleaseSummary":
+        pr_links = re.findall(r"^\s*- (https://\S+): ", prompt, re.M)
+        return json.dumps(
+            {
+                "overview": f"Refactors modules across {len(pr_links)} pull requests.",
+                "highlights": [f"Refactored helpers ({link})" for link in pr_links[:5]],
+                "risks": "None noted",
+            }
+        )
+    return json.dumps(
+        {
+            "overall_summary": "Refactors the affected modules and updates computed values.",
+            "file_changes": file_changes,
+            "technical_details": "No behaviour change expected outside the touched modules.",
+        }
+    )
+
+
+def _completion_chunks(model: str, content: str, piece: int = 24) -> List[str]:
+    chunks = []
+    for start in range(0, len(content), piece):
+        chunk = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": content[start : start + piece]}, "finish_reason": None}],
+        }
+        chunks.append(f"data: {json.dumps(chunk)}\n\n")
+    chunks.append("data: [DONE]\n\n")
+    return chunks
+
+
+def build_fake_app(
+    catalog: DiffCatalog,
+    github: UpstreamProfile,
+    openai: UpstreamProfile,
+    slack: UpstreamProfile,
+    recorder: Recorder,
+) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/github/repos/{owner}/{repo}/pulls/{number}")
+    async def github_pull(owner: str, repo: str, number: int, request: Request):
+        wants_diff = "diff" in request.headers.get("accept", "")
+        recorder.count("github_diff" if wants_diff else "github_pr")
+        await github.delay()
+        if github.should_fail():
+            return JSONResponse({"message": "Server Error"}, status_code=502)
+
+        diff = catalog.for_pr(number)
+        etag = f'"{number}-{"diff" if wants_diff else "pr"}"'
+        if request.headers.get("if-none-match") == etag:
+            recorder.count("github_not_modified")
+            return Response(status_code=304, headers={"ETag": etag})
+        if wants_diff:
+            return PlainTextResponse(diff.text, headers={"ETag": etag})
+        return JSONResponse(_pr_json(owner, repo, number, diff), headers={"ETag": etag})
+
+    @app.get("/github/repos/{owner}/{repo}/compare/{basehead:path}")
+    async def github_compare(owner: str, repo: str, basehead: str, page: int = 1, per_page: int = 250):
+        recorder.count("github_compare")
+        await github.delay()
+        base, _, head = basehead.partition("...")
+        if not (base.isdigit() and head.isdigit()):
+            return JSONResponse({"message": "Not Found"}, status_code=404)
+        numbers = range(int(base) + 1, int(head) + 1)
+        commits = [
+            {"sha": f"{number:040x}", "commit": {"message": f"Merge pull request #{number} from {owner}/bench-{number}"}}
+            for number in numbers[(page - 1) * per_page : page * per_page]
+        ]
+        return {"status": "ahead", "total_commits": len(numbers), "commits": commits}
+
+    @app.post("/openai/v1/chat/completions")
+    async def openai_completions(request: Request):
+        body = await request.json()
+        recorder.count("openai")
+        await openai.delay()
+        if openai.should_fail():
+            return JSONResponse({"error": {"message": "overloaded", "type": "server_error"}}, status_code=503)
+
+        content = _completion_content(body)
+        if body.get("stream"):
+            return StreamingResponse(iter(_completion_chunks(body["model"], content)), media_type="text/event-stream")
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": {"prompt_tokens": len(str(body)) // 4, "completion_tokens": len(content) // 4, "total_tokens": 0},
+        }
+
+    @app.post("/slack/api/{method}")
+    async def slack_api(method: str):
+        recorder.count(f"slack_{method}")
+        await slack.delay()
+        if slack.should_fail():
+            return JSONResponse({"ok": False, "error": "internal_error"}, status_code=500)
+        return {"ok": True, "channel": "CBENCH", "ts": f"{time.time():.6f}"}
+
+    @app.post("/slack/response/{request_id}")
+    async def slack_response_url(request_id: str, request: Request):
+        body = await request.json()
+        recorder.count("slack_response_url")
+        await slack.delay()
+        if slack.should_fail():
+            return PlainTextResponse("internal_error", status_code=500)
+        if recorder.on_response_url is not None:
+            recorder.on_response_url(request_id, time.perf_counter(), body.get("text", ""))
+        return PlainTextResponse("ok")
+
+    return app
@@ -0,0 +1,422 @@
+"""
+Hermetic load test for the bot's request paths. Runs the FastAPI app in-process against local
+GitHub/OpenAI/Slack stand-ins (bench/fakes.py) and a throwaway redis-server, drives each scenario
+at a target rate, and reports ack and end-to-end latency percentiles, event-loop lag of the app's
+loop, cache hit rate and upstream call counts.
+
+    python bench/run.py --scenario all --rps 20 --duration 30
+    python bench/run.py --scenario summarize_cold --openai-latency 2 --openai-failure-rate 0.05
+    python bench/run.py --redis-url redis://localhost:6379/15 --diff-dir recorded_diffs/
+
+Scenarios:
+    summarize_cold  /slack/summarizepr for a new PR every request (GitHub + OpenAI on every call)
+    summarize_hot   /slack/summarizepr over a small pool of PRs (mostly cache hits)
+    postprs         /github/postprs pull_request webhooks (opened/synchronize/closed/reopened)
+    postpushes      /github/postpushes merges to main and branch pushes
+
+Other app settings can be tuned through the usual environment variables; upstream URLs, tokens
+and REDIS_URL are always pointed at the local stand-ins.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+
+from diffs import SIZE_CLASSES, DiffCatalog, load_recorded_diffs
+from fakes import Recorder, UpstreamProfile, build_fake_app
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+SCENARIOS = ("summarize_cold", "summarize_hot", "postprs", "postpushes")
+BENCH_REPO = "bench/repo"
+WEBHOOK_SECRET = "bench-secret"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LoopLagProbe:
+    """Measures how late a short sleep wakes up on the loop it runs on"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+
+    async def run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - start - self.interval)
+
+    def take(self) -> List[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+
+class ServerThread:
+    """A uvicorn server on its own thread and event loop"""
+
+    def __init__(self, app, port: int, probe: Optional[LoopLagProbe] = None):
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+        )
+        self.probe = probe
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True)
+
+    async def _serve(self) -> None:
+        probe_task = asyncio.create_task(self.probe.run()) if self.probe else None
+        try:
+            await self.server.serve()
+        finally:
+            if probe_task:
+                probe_task.cancel()
+
+    def start(self, timeout: float = 30.0) -> None:
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+def start_redis() -> Tuple[str, subprocess.Popen]:
+    binary = shutil.which("redis-server")
+    if binary is None:
+        sys.exit("redis-server not found on PATH; install it or pass --redis-url")
+    port = _free_port()
+    process = subprocess.Popen(
+        [binary, "--port", str(port), "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return f"redis://127.0.0.1:{port}/0", process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    sys.exit("redis-server did not start")
+
+
+@dataclass
+class BenchRequest:
+    path: str
+    wait_for_reply: bool = False
+    data: Optional[Dict[str, str]] = None
+    json: Optional[Dict[str, Any]] = None
+    headers: Optional[Dict[str, str]] = None
+
+
+@dataclass
+class RequestResult:
+    status: int
+    ack: float
+    e2e: Optional[float] = None  # Until the response_url reply arrived, for summarize requests
+
+
+def make_request_builder(scenario: str, args, fake_url: str) -> Callable[[int, str], BenchRequest]:
+    rng = random.Random(args.seed)
+    # Fresh PR numbers per run so cold requests miss even against a reused Redis
+    base = rng.randrange(1_000_000, 9_000_000)
+
+    def summarize(number: int, request_id: str) -> BenchRequest:
+        return BenchRequest(
+            "/slack/summarizepr",
+            wait_for_reply=True,
+            data={
+                "text": f"https://github.com/{BENCH_REPO}/pull/{number}",
+                "response_url": f"{fake_url}/slack/response/{request_id}",
+                "channel_id": "CBENCH",
+            },
+        )
+
+    if scenario == "summarize_cold":
+        return lambda i, request_id: summarize(base + i, request_id)
+
+    if scenario == "summarize_hot":
+        return lambda i, request_id: summarize(base + rng.randrange(args.hot_pool), request_id)
+
+    if scenario == "postprs":
+
+        def pull_request_event(i: int, request_id: str) -> BenchRequest:
+            number = base + rng.randrange(args.hot_pool)
+            return BenchRequest(
+                "/github/postprs",
+                json={
+                    "action": rng.choice(("opened", "synchronize", "closed", "reopened")),
+                    "pull_request": {
+                        "html_url": f"https://github.com/{BENCH_REPO}/pull/{number}",
+                        "head": {"sha": f"{rng.getrandbits(160):040x}"},
+                    },
+                },
+                headers={"X-GitHub-Event": "pull_request", "X-GitHub-Delivery": request_id},
+            )
+
+        return pull_request_event
+
+    def push_event(i: int, request_id: str) -> BenchRequest:
+        number = base + rng.randrange(args.hot_pool)
+        if i % 2 == 0:
+            payload = {
+                "ref": "refs/heads/main",
+                "head_commit": {"id": request_id, "message": f"Merge pull request #{number} from bench/bench-{number}"},
+                "repository": {"name": "repo", "full_name": BENCH_REPO},
+            }
+        else:
+            payload = {
+                "ref": f"refs/heads/bench-{number}",
+                "after": f"{rng.getrandbits(160):040x}",
+                "repository": {"name": "repo", "full_name": BENCH_REPO},
+            }
+        return BenchRequest(
+            "/github/postpushes",
+            json=payload,
+            headers={"X-GitHub-Event": "push", "X-GitHub-Delivery": request_id},
+        )
+
+    return push_event
+
+
+class ReplyWaiter:
+    """Resolves a future when the fake Slack receives a response_url post for a request"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.pending: Dict[str, asyncio.Future] = {}
+
+    def expect(self, request_id: str) -> asyncio.Future:
+        future = self.loop.create_future()
+        self.pending[request_id] = future
+        return future
+
+    # Called from the fake servers' thread
+    def on_response_url(self, request_id: str, received_at: float, text: str) -> None:
+        self.loop.call_soon_threadsafe(self._resolve, request_id, received_at)
+
+    def _resolve(self, request_id: str, received_at: float) -> None:
+        future = self.pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_result(received_at)
+
+
+async def send_one(
+    client: httpx.AsyncClient, request: BenchRequest, request_id: str, waiter: ReplyWaiter, reply_timeout: float
+) -> RequestResult:
+    reply = waiter.expect(request_id) if request.wait_for_reply else None
+    headers = dict(request.headers or {})
+    content = None
+    if request.json is not None:
+        # Signed like GitHub does, so the app's verification is part of what is measured
+        content = json.dumps(request.json).encode()
+        digest = hmac.new(WEBHOOK_SECRET.encode(), content, hashlib.sha256).hexdigest()
+        headers.update({"Content-Type": "application/json", "X-Hub-Signature-256": f"sha256={digest}"})
+    start = time.perf_counter()
+    try:
+        response = await client.post(request.path, data=request.data, content=content, headers=headers)
+        status = response.status_code
+    except httpx.HTTPError:
+        status = 0
+    result = RequestResult(status, time.perf_counter() - start)
+
+    if reply is not None:
+        try:
+            result.e2e = await asyncio.wait_for(reply, reply_timeout) - start
+        except asyncio.TimeoutError:
+            waiter.pending.pop(request_id, None)
+    return result
+
+
+def percentiles(values: List[float]) -> str:
+    if not values:
+        return "-"
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000
+
+    return f"p50 {at(0.50):.1f} / p95 {at(0.95):.1f} / p99 {at(0.99):.1f} ms"
+
+
+def cache_hit_rate(before: Dict[str, Any], after: Dict[str, Any]) -> str:
+    def delta(tier: str, key: str) -> int:
+        return after[tier][key] - before[tier][key]
+
+    local_hits, redis_hits, redis_misses = delta("local", "hits"), delta("redis", "hits"), delta("redis", "misses")
+    lookups = local_hits + redis_hits + redis_misses
+    if not lookups:
+        return "- (no lookups)"
+    return (
+        f"{(local_hits + redis_hits) / lookups:.1%} of {lookups} lookups "
+        f"(local {local_hits}, redis {redis_hits}, miss {redis_misses})"
+    )
+
+
+async def run_scenario(
+    scenario: str, args, client: httpx.AsyncClient, fake_url: str, waiter: ReplyWaiter, probe: LoopLagProbe, recorder: Recorder
+) -> str:
+    build = make_request_builder(scenario, args, fake_url)
+    total = max(int(args.rps * args.duration), 1)
+    cache_before = (await client.get("/cache/stats")).json()
+    calls_before = recorder.snapshot()
+    probe.take()
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(total):
+        # Open loop: requests go out on schedule whether or not earlier ones have finished
+        delay = start + i / args.rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        request_id = uuid.uuid4().hex
+        tasks.append(asyncio.create_task(send_one(client, build(i, request_id), request_id, waiter, args.reply_timeout)))
+    results = await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    lag = probe.take()
+    cache_after = (await client.get("/cache/stats")).json()
+    calls_after = recorder.snapshot()
+    calls = {name: count - calls_before.get(name, 0) for name, count in calls_after.items()}
+
+    ok = [r for r in results if 200 <= r.status < 300]
+    lines = [
+        f"== {scenario}: {total} requests at {args.rps:g} rps target, {total / elapsed:.1f} rps achieved",
+        f"  ok            {len(ok)}/{total}",
+        f"  ack latency   {percentiles([r.ack for r in ok])}",
+    ]
+    if scenario.startswith("summarize"):
+        replied = [r.e2e for r in results if r.e2e is not None]
+        lines.append(f"  reply latency {percentiles(replied)} ({total - len(replied)} without a reply)")
+    lines += [
+        f"  loop lag      {percentiles(lag)}, max {max(lag, default=0) * 1000:.1f} ms",
+        f"  cache hits    {cache_hit_rate(cache_before, cache_after)}",
+        f"  upstream      {', '.join(f'{name} {count}' for name, count in sorted(calls.items()) if count) or '-'}",
+    ]
+    return "\n".join(lines)
+
+
+def configure_app_env(args, fake_url: str, redis_url: str) -> None:
+    os.environ.update(
+        {
+            "REDIS_URL": redis_url,
+            "GITHUB_API_BASE_URL": f"{fake_url}/github",
+            "OPENAI_BASE_URL": f"{fake_url}/openai/v1",
+            "SLACK_API_BASE_URL": f"{fake_url}/slack/api/",
+            "OPENAI_API_KEY": "bench",
+            "GITHUB_TOKEN": "bench",
+            "BOT_USER_OAUTH_TOKEN": "xoxb-bench",
+            "SLACK_GPT_BOT_CHANNEL_ID": "CBENCH",
+            "GITHUB_WEBHOOK_SECRET": WEBHOOK_SECRET,
+        }
+    )
+    os.environ.setdefault("EMBEDDED_WORKER_CONCURRENCY", str(args.workers))
+    # Replies must come back through response_url to be timed
+    os.environ.setdefault("SUMMARY_STREAMING_ENABLED", "false")
+
+
+async def drive(args, app_url: str, fake_url: str, probe: LoopLagProbe, recorder: Recorder) -> List[str]:
+    waiter = ReplyWaiter(asyncio.get_running_loop())
+    recorder.on_response_url = waiter.on_response_url
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.reply_timeout, limits=limits) as client:
+        scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+        return [await run_scenario(s, args, client, fake_url, waiter, probe, recorder) for s in scenarios]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target request rate per scenario")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--hot-pool", type=int, default=10, help="Distinct PRs in the hot/webhook scenarios")
+    parser.add_argument("--sizes", default="small,medium,large", help=f"Synthetic diff sizes: {', '.join(SIZE_CLASSES)}")
+    parser.add_argument("--diff-dir", help="Serve recorded *.diff files instead of synthetic diffs")
+    parser.add_argument("--github-latency", type=float, default=0.1)
+    parser.add_argument("--github-failure-rate", type=float, default=0.0)
+    parser.add_argument("--openai-latency", type=float, default=1.0)
+    parser.add_argument("--openai-failure-rate", type=float, default=0.0)
+    parser.add_argument("--slack-latency", type=float, default=0.05)
+    parser.add_argument("--slack-failure-rate", type=float, default=0.0)
+    parser.add_argument("--redis-url", help="Use this Redis instead of starting a redis-server")
+    parser.add_argument("--workers", type=int, default=4, help="Embedded job queue worker concurrency")
+    parser.add_argument("--reply-timeout", type=float, default=120.0, help="Seconds to wait for a Slack reply")
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="Also append the report to this file")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    recorded = load_recorded_diffs(args.diff_dir) if args.diff_dir else []
+    catalog = DiffCatalog(recorded, [size.strip() for size in args.sizes.split(",") if size.strip()])
+    recorder = Recorder()
+
+    fake_port, app_port = _free_port(), _free_port()
+    fake_url, app_url = f"http://127.0.0.1:{fake_port}", f"http://127.0.0.1:{app_port}"
+    redis_process = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        redis_url, redis_process = start_redis()
+
+    fakes = ServerThread(
+        build_fake_app(
+            catalog,
+            UpstreamProfile(args.github_latency, args.github_failure_rate),
+            UpstreamProfile(args.openai_latency, args.openai_failure_rate),
+            UpstreamProfile(args.slack_latency, args.slack_failure_rate),
+            recorder,
+        ),
+        fake_port,
+    )
+
+    # The app reads its configuration at import time
+    configure_app_env(args, fake_url, redis_url)
+    sys.path.insert(0, APP_DIR)
+    from main import app
+
+    probe = LoopLagProbe()
+    app_server = ServerThread(app, app_port, probe)
+    try:
+        fakes.start()
+        app_server.start()
+        report = asyncio.run(drive(args, app_url, fake_url, probe, recorder))
+    finally:
+        app_server.stop()
+        fakes.stop()
+        if redis_process is not None:
+            redis_process.terminate()
+
+    text = "\n\n".join(report)
+    print(text)
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(text + "\n\n")
+
+
+if __name__ == "__main__":
+    main()